@@ -0,0 +1,289 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from ecofly_figures import comparison_table
+from ecofly_simulation import simulate
+from ecofly_snapshots import slug
+
+log = logging.getLogger(__name__)
+
+# --------------------------
+# Local KPI query API
+# --------------------------
+# Read-only HTTP/JSON access to what the dashboard shows with the default
+# assumptions, for tools that would otherwise scrape the Streamlit UI:
+#
+#   GET  /v1/meta                         scenarios, years, metrics, data digest
+#   GET  /v1/kpis                         the whole scenario × year × metric cube
+#   GET  /v1/kpis/<scenario>/<year>       one get_kpi row
+#   GET  /v1/kpis?scenario=…&year=…       batch: every listed scenario × year
+#   POST /v1/kpis/batch                   batch: {"pairs": [[scenario, year], …], "metrics": […]}
+#   GET  /v1/comparison/<year>            the comparison table
+#   GET  /v1/trend/<scenario>             yearly CO₂ series plus the KPI table years
+#
+# Scenarios are addressed by name or by slug ("scenario-1-drop-in-saf").
+# Fixed responses are rendered, hashed and gzipped once per data set and
+# served from memory; every response carries an ETag and answers
+# If-None-Match with 304. The index is rebuilt when the KPI data changes.
+DEFAULT_PORT = 8502
+API_PREFIX = "/v1"
+GZIP_MIN_BYTES = 512
+MAX_REQUEST_BYTES = 1 << 20
+
+Response = namedtuple("Response", "body gzipped etag")
+
+
+def _json(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode()
+
+
+def _number(v):
+    return None if np.isnan(v) else (int(v) if float(v).is_integer() else float(v))
+
+
+def make_response(body):
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    gzipped = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+    return Response(body, gzipped, etag)
+
+
+class KpiIndex:
+    """Every fixed API response for one KPI data set."""
+
+    def __init__(self, data):
+        self.store = store = simulate(store=data.store, investments=data.investments)
+        self.digest = data.store.digest
+        self.by_name = {**{slug(s): s for s in store.scenarios}, **{s: s for s in store.scenarios}}
+        self.responses = {}
+
+        def add(path, payload):
+            self.responses[f"{API_PREFIX}/{path}"] = make_response(_json(payload))
+
+        add("meta", {
+            "digest": self.digest, "scenarios": store.scenarios, "years": store.years, "metrics": store.metrics,
+            "slugs": {s: slug(s) for s in store.scenarios}, "investments": data.investments,
+        })
+        add("kpis", self._rows(store.scenarios, store.years))
+        for s in store.scenarios:
+            for y in store.years:
+                add(f"kpis/{slug(s)}/{y}", self._rows([s], [y])[0])
+            add(f"trend/{slug(s)}", {
+                "scenario": s, "years": store.years,
+                "CO2": [_number(v) for v in store.take([s], None, ["CO2"]).ravel()],
+                "points": data.store.known_years(s),
+            })
+        scenarios = list(data.investments)
+        for y in store.years:
+            df = comparison_table(store, y, scenarios, data.investments)
+            add(f"comparison/{y}", {
+                "year": y, "rows": [{k: _number(v) if k != "Scenario" else v for k, v in row.items()}
+                                    for row in df.to_dict(orient="records")],
+            })
+
+    def _rows(self, scenarios, years, metrics=None):
+        metrics = list(self.store.metrics if metrics is None else metrics)
+        cube = self.store.take(scenarios, years, metrics)
+        return [
+            {"scenario": s, "year": y, "kpis": dict(zip(metrics, map(_number, cube[i, j])))}
+            for i, s in enumerate(scenarios) for j, y in enumerate(years)
+        ]
+
+    def batch(self, pairs, metrics=None):
+        """One row per (scenario, year) pair, in request order.
+
+        Raises KeyError on unknown labels, and TypeError or ValueError when
+        ``metrics`` is not a list of names or a year is not an integer.
+        """
+        if metrics is None:
+            metrics = self.store.metrics
+        elif isinstance(metrics, str) or not all(isinstance(m, str) for m in metrics):
+            raise TypeError("metrics must be a list of metric names")
+        metrics = list(metrics)
+        unknown = [m for m in metrics if m not in self.store.metric_index]
+        scenarios, years = [], []
+        for scenario, year in pairs:
+            try:
+                year = int(year)
+            except (TypeError, ValueError):
+                raise ValueError("years must be integers") from None
+            if str(scenario) not in self.by_name:
+                unknown.append(scenario)
+            elif year not in self.store.year_index:
+                unknown.append(year)
+            else:
+                scenarios.append(self.by_name[str(scenario)])
+                years.append(year)
+        if unknown:
+            raise KeyError(unknown)
+        s = [self.store.scenario_index[x] for x in scenarios]
+        y = [self.store.year_index[x] for x in years]
+        m = [self.store.metric_index[x] for x in metrics]
+        cube = self.store.values[np.asarray(s, dtype=int)[:, None], np.asarray(y, dtype=int)[:, None], m]
+        return [
+            {"scenario": a, "year": b, "kpis": dict(zip(metrics, map(_number, row)))}
+            for a, b, row in zip(scenarios, years, cube)
+        ]
+
+    def lookup(self, path):
+        """Fixed response for a path, accepting scenario names as well as slugs."""
+        if path in self.responses:
+            return self.responses[path]
+        parts = path.split("/")
+        for i, part in enumerate(parts):
+            if part in self.by_name:
+                parts[i] = slug(self.by_name[part])
+        return self.responses.get("/".join(parts))
+
+
+class KpiApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, source):
+        super().__init__(address, KpiHandler)
+        self.source = source
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        """The index for the current KPI data, rebuilt once when the data changes."""
+        data = self.source.current()
+        index = self._index
+        if index is None or index.digest != data.store.digest:
+            with self._lock:
+                if self._index is None or self._index.digest != data.store.digest:
+                    self._index = KpiIndex(data)
+                    log.info("KPI API index built for %s", data.store.digest[:12])
+                index = self._index
+        return index
+
+
+class KpiHandler(BaseHTTPRequestHandler):
+    server_version = "EcoFlyKpiApi/1"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path).rstrip("/") or "/"
+        index = self.server.index()
+        if path == f"{API_PREFIX}/kpis" and url.query:
+            query = parse_qs(url.query)
+            scenarios = query.get("scenario", index.store.scenarios)
+            years = query.get("year", index.store.years)
+            pairs = [(s, y) for s in scenarios for y in years]
+            return self._batch(index, pairs, query.get("metric"))
+        response = index.lookup(path)
+        if response is None:
+            return self._error(HTTPStatus.NOT_FOUND, f"no such resource: {path}")
+        self._send(response)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # the body's extent is unknown
+            return self._error(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            return self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"requests are limited to {MAX_REQUEST_BYTES} bytes")
+        raw = self.rfile.read(length)
+        if urlsplit(self.path).path.rstrip("/") != f"{API_PREFIX}/kpis/batch":
+            return self._error(HTTPStatus.NOT_FOUND, f"no such resource: {self.path}")
+        try:
+            request = json.loads(raw or b"{}")
+            if not isinstance(request["pairs"], list):
+                raise TypeError
+            pairs = [(s, y) for s, y in request["pairs"]]
+        except (ValueError, KeyError, TypeError):
+            return self._error(HTTPStatus.BAD_REQUEST, 'expected {"pairs": [[scenario, year], …]}')
+        self._batch(self.server.index(), pairs, request.get("metrics"))
+
+    def _batch(self, index, pairs, metrics):
+        try:
+            rows = index.batch(pairs, metrics)
+        except KeyError as e:
+            return self._error(HTTPStatus.NOT_FOUND, f"unknown scenario, year or metric: {e.args[0]}")
+        except (TypeError, ValueError) as e:
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        self._send(make_response(_json({"digest": index.digest, "rows": rows})))
+
+    def _send(self, response):
+        etags = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+        if response.etag in etags or "*" in etags:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", response.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = response.body
+        self.send_response(HTTPStatus.OK)
+        if response.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = response.gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", response.etag)
+        self.send_header("Cache-Control", "no-cache")  # revalidate with If-None-Match
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        body = _json({"error": message})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("%s " + format, self.address_string(), *args)
+
+
+def _serve(server):
+    try:
+        server.index()  # build before the first request rather than during it
+    except Exception:  # requests retry the build and report the error
+        log.exception("KPI API index build failed")
+    server.serve_forever()
+
+
+def start_background(source, port=DEFAULT_PORT, host="127.0.0.1"):
+    """Serve the API from a daemon thread; returns the server, or None if the port is taken."""
+    try:
+        server = KpiApiServer((host, port), source)
+    except OSError as e:  # e.g. another app process already serves it
+        log.warning("KPI API not started on %s:%s: %s", host, port, e)
+        return None
+    threading.Thread(target=_serve, args=(server,), name="ecofly-kpi-api", daemon=True).start()
+    log.info("KPI API on http://%s:%s%s", host, port, API_PREFIX)
+    return server
+
+
+if __name__ == "__main__":
+    from ecofly_datasource import default_source
+
+    parser = argparse.ArgumentParser(description="Serve the dashboard's KPIs as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    server = KpiApiServer((args.host, args.port), default_source())
+    log.info("KPI API on http://%s:%s%s", args.host, args.port, API_PREFIX)
+    _serve(server)
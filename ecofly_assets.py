@@ -0,0 +1,81 @@
+import hashlib
+import os
+from pathlib import Path
+
+# --------------------------
+# Responsive logo variants
+# --------------------------
+# The source logo is 1.35 MB; visitors get a downscaled, recompressed copy
+# that fits their screen instead. Variants are keyed by the hash of the
+# source file, so replacing the PNG produces a fresh set automatically.
+APP_DIR = Path(__file__).resolve().parent
+LOGO_PATH = APP_DIR / "ecofly_logo.png"
+STATIC_DIR = APP_DIR / "static"
+LOGO_WIDTHS = (320, 640, 960, 1472)
+LOGO_FORMATS = ("webp", "png")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _save(image, path, fmt):
+    from PIL import Image
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    if fmt == "webp":
+        image.save(tmp, "WEBP", quality=80, method=6)
+    else:
+        image.quantize(256, method=Image.Quantize.FASTOCTREE).save(tmp, "PNG", optimize=True)
+    os.replace(tmp, path)  # never expose a half-written file to the static server
+
+
+def build_logo_variants(source=LOGO_PATH, widths=LOGO_WIDTHS, formats=LOGO_FORMATS):
+    """Write (or reuse) scaled variants; returns {format: [(width, path), ...]}."""
+    out_dir = STATIC_DIR / "logo" / file_hash(source)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    variants = {fmt: [] for fmt in formats}
+    image = None
+    for width in sorted(widths):
+        for fmt in formats:
+            path = out_dir / f"logo-{width}.{fmt}"
+            if not path.exists():
+                if image is None:
+                    from PIL import Image  # only needed when variants are missing
+
+                    image = Image.open(source)
+                    image.load()
+                scaled = image if width >= image.width else image.resize(
+                    (width, round(image.height * width / image.width)), Image.LANCZOS
+                )
+                _save(scaled, path, fmt)
+            variants[fmt].append((width, path))
+    return variants
+
+
+def logo_html(variants, alt="EcoFly logo"):
+    """<picture> element letting the browser fetch the smallest variant that fits."""
+    def srcset(fmt):
+        return ", ".join(
+            f"app/static/{path.relative_to(STATIC_DIR).as_posix()} {width}w"
+            for width, path in variants[fmt]
+        )
+
+    fallback_width, fallback = variants["png"][-1]
+    return (
+        "<picture>"
+        f'<source type="image/webp" srcset="{srcset("webp")}" sizes="100vw">'
+        f'<img src="app/static/{fallback.relative_to(STATIC_DIR).as_posix()}" '
+        f'srcset="{srcset("png")}" sizes="100vw" alt="{alt}" style="width:100%;height:auto">'
+        "</picture>"
+    )
+
+
+if __name__ == "__main__":
+    for fmt, items in build_logo_variants().items():
+        for width, path in items:
+            print(f"{fmt:5} {width:5}px  {path.stat().st_size:>9,} B  {path.relative_to(APP_DIR)}")
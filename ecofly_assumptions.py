@@ -0,0 +1,31 @@
+from dataclasses import dataclass, fields
+
+# --------------------------
+# Key assumptions
+# --------------------------
+@dataclass(frozen=True)
+class Assumptions:
+    # Financial
+    cost_of_capital: float = 0.035
+    inflation: float = 0.015
+    # Growth forecasts (2025–2041)
+    pax_growth: float = 0.042
+    cargo_growth: float = 0.045
+    # Ticket pricing (€)
+    train_price: float = 100.0
+    sh_price: float = 80.0
+    lh_price: float = 100.0
+    # Baseline pax volumes (starting FY25/26)
+    pax_sh: float = 180.0
+    pax_lh: float = 300.0
+    pax_train: float = 350.0
+    # Fuel price indices (1.0 = prices behind the KPI tables)
+    fuel_price: float = 1.0
+    saf_price: float = 1.0
+
+
+DEFAULT_ASSUMPTIONS = Assumptions()
+ASSUMPTION_FIELDS = tuple(f.name for f in fields(Assumptions))
+
+# How KPIs are filled in between the years the KPI tables report.
+INTERPOLATION_METHODS = ("linear", "monotone", "step")
@@ -0,0 +1,50 @@
+from functools import wraps
+
+import streamlit as st
+
+from ecofly_perf import count
+
+# --------------------------
+# Session-shared caches
+# --------------------------
+# Immutable resources (decoded assets, KPI tables) live in process-wide
+# resource caches; derived artifacts (figures, tables) in per-input data
+# caches. Both are bounded and evict least-recently-used entries.
+_caches = []
+
+
+def _counted(decorator, func):
+    # The body only runs on a miss; every call goes through `call`.
+    @wraps(func)
+    def miss(*args, **kwargs):
+        count(f"cache.{func.__name__}.misses")
+        return func(*args, **kwargs)
+
+    cached = decorator(miss)
+
+    @wraps(func)
+    def call(*args, **kwargs):
+        count(f"cache.{func.__name__}.calls")
+        return cached(*args, **kwargs)
+
+    call.clear = cached.clear
+    _caches.append(cached)
+    return call
+
+
+def resource_cache(max_entries=None):
+    def wrap(func):
+        return _counted(st.cache_resource(max_entries=max_entries, show_spinner=False), func)
+    return wrap
+
+
+def data_cache(max_entries=64):
+    def wrap(func):
+        return _counted(st.cache_data(max_entries=max_entries, show_spinner=False), func)
+    return wrap
+
+
+def clear_caches():
+    """Invalidation hook: drop every cached resource and artifact."""
+    for cached in _caches:
+        cached.clear()
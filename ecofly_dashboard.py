@@ -1,205 +1,174 @@
+import functools
+import os
+
 import streamlit as st 
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from PIL import Image
-import numpy as np
+import ecofly_assets
+from ecofly_assumptions import DEFAULT_ASSUMPTIONS, INTERPOLATION_METHODS, Assumptions
+from ecofly_cache import data_cache, resource_cache
+from ecofly_perf import (
+    first_render, lazy_import, perf_enabled, recording, recording_active, rerun_report_markdown, stage,
+    startup_report_enabled, startup_report_markdown,
+)
 
 # --------------------------
 # Page Configuration
 # --------------------------
 st.set_page_config("EcoFly Dashboard", layout="wide")
-logo = Image.open("ecofly_logo.png")
+
 
 # --------------------------
-# Number formatting helper
+# Cached assets and artifacts
 # --------------------------
-def format_number(n, unit=""):
-    if isinstance(n, str):  # bijvoorbeeld "-"
-        return n
-
-    try:
-        abs_n = abs(n)
-        if abs_n >= 1e9:
-            return f"{n / 1e9:.1f} B{unit}"  # miljard
-        elif abs_n >= 1e6:
-            return f"{n / 1e6:.1f} M{unit}"  # miljoen
-        elif abs_n >= 1e3:
-            return f"{n / 1e3:.0f} K{unit}"  # duizend
-        elif abs_n == int(abs_n):
-            return f"{int(n)}{unit}"
-        else:
-            return f"{n:.2f}{unit}"
-    except:
-        return str(n)  # fallback als n niet numeriek is
+# `digest` identifies the KPI data a cached artifact was built from, so a
+# new data set never serves stale figures or tables. NumPy, pandas and
+# Plotly are only imported once a page that shows KPIs is opened.
+@resource_cache()
+def logo_variants():
+    return ecofly_assets.build_logo_variants()
+
+
+@resource_cache()
+def kpi_source():
+    import ecofly_datasource
+    return ecofly_datasource.default_source()
+
+
+@resource_cache()
+def kpi_api(port):
+    # One JSON API per server process, next to the app (see ecofly_api)
+    import ecofly_api
+    return ecofly_api.start_background(kpi_source(), port)
+
+
+# Results of `python ecofly_prewarm.py` for the same inputs are attached
+# (memory-mapped, shared with the other server processes) instead of
+# recomputed; the prewarm step builds the default-assumption ones.
+# `investments` is KpiData.investments as a tuple of items.
+@resource_cache(max_entries=32)
+def simulated_store(_raw, digest, assumptions, interpolation, investments):
+    import ecofly_prewarm
+    import ecofly_simulation
+    shared = ecofly_prewarm.attach("simulated_store", digest, assumptions, interpolation, investments)
+    return shared if shared is not None else ecofly_simulation.simulate(
+        assumptions, _raw, interpolation=interpolation, investments=dict(investments)
+    )
 
 
+@resource_cache(max_entries=32)
+def monte_carlo_bands(_raw, digest, assumptions, interpolation, investments, scenario, n_samples):
+    # A resource, not data: the bands (memory-mapped when shared) are only
+    # read, so every rerun uses them in place instead of a pickled copy.
+    import ecofly_prewarm
+    import ecofly_simulation
+    shared = ecofly_prewarm.attach(
+        "monte_carlo_bands", digest, assumptions, interpolation, investments, scenario, n_samples
+    )
+    return shared if shared is not None else ecofly_simulation.monte_carlo(
+        assumptions, scenario, n_samples=n_samples, store=_raw, interpolation=interpolation,
+        investments=dict(investments),
+    )
 
-# --------------------------
-# Investment + Calculation Logic
-# --------------------------
-investments = {
-    "Baseline (No Innovation)": 0,
-    "Scenario 1 – Drop-in SAF": 250,
-    "Scenario 2 – Green Hydrogen": 400,
-    "Scenario 3 – Battery Electric": 350,
-    "Scenario 4 – Train for SH flights": 300,   # Updated scenario
-}
-train_kpis = {
-    2030: {"Revenue": 1003000000, "Profit": 93000000, "Cashflow": -144000000, "Waste": 161987703, "CO2": 815461, "TRL": 9},
-    2040: {"Revenue": 1014000000, "Profit": 70000000, "Cashflow": 47000000, "Waste": 168791186, "CO2": 730146, "TRL": 9},
-    2050: {"Revenue": 1025000000, "Profit": 238000000, "Cashflow": 41000000, "Waste": 175880416, "CO2": 645831, "TRL": 9}
-}
 
-saf_kpis = {
-    2030: {"Revenue": 814102792, "Profit": 261921948, "Cashflow": 170760538, "Waste": 161987703, "CO2": 720635, "TRL": 9},
-    2040: {"Revenue": 870884190, "Profit": 244412043, "Cashflow": 112405480, "Waste": 168791186, "CO2": 540476, "TRL": 9},
-    2050: {"Revenue": 916321626, "Profit": 216304917, "Cashflow": 55093729, "Waste": 175880416, "CO2": 459785, "TRL": 9}
-}
-eflight_kpis = {
-    2030: {
-        "Revenue": 1_131_483_298.91,
-        "Profit": 249_046_359,
-        "Cashflow": 249_046_350,
-        "Waste": 163_328_532,
-        "CO2": 900_775,
-        "TRL": 9
-    },
-    2040: {
-        "Revenue": 379_746_000,
-        "Profit": -348_471_324,
-        "Cashflow": -348_471_324,
-        "Waste": 3_127_320,
-        "CO2": 0,
-        "TRL": 3
-    },
-    2050: {
-        "Revenue": 462_908_255,
-        "Profit": 65_690_931,
-        "Cashflow": -173_869_558,
-        "Waste": 3_127_320,
-        "CO2": 0,
-        "TRL": 1
-    }
-}
+# Trend charts come from a pre-rendered snapshot when one matches the data.
+@data_cache(max_entries=32)
+def emissions_trend_figure(_store, digest, _raw, scenario, points):
+    import ecofly_figures
+    import ecofly_snapshots
+    fig = ecofly_snapshots.snapshot_figure(_store, _raw, scenario)
+    return fig if fig is not None else ecofly_figures.emissions_trend_figure(_store, scenario, list(points))
 
 
-best_kpis = {
-    2030: {
-        "Revenue": 1030904820,
-        "Profit": 51509579,
-        "Cashflow": -267732230,
-        "Waste": 161987703,
-        "CO2": 653753,
-        "TRL": 9
-    },
-    2040: {
-        "Revenue": 1047903920,
-        "Profit": 1457335,
-        "Cashflow": -408336284,
-        "Waste": 168791186,
-        "CO2": 442859,
-        "TRL": 9
-    },
-    2050: {
-        "Revenue": 1074234280,
-        "Profit": 198831371,
-        "Cashflow": 302465099,
-        "Waste": 175880416,
-        "CO2": 268093,
-        "TRL": 9
-    }
-}
+@data_cache(max_entries=8)
+def hybrid_trend_figure(_store, digest, _raw, scenario, points):
+    import ecofly_figures
+    import ecofly_snapshots
+    fig = ecofly_snapshots.snapshot_figure(_store, _raw, scenario)
+    return fig if fig is not None else ecofly_figures.hybrid_trend_figure(_store, scenario, list(points))
 
-h2_kpis = {
-    2025: {
-        "Revenue": 993355902,
-        "Profit": 147079247,
-        "Cashflow": 147079247,
-        "Waste": 155458448,  # ← from your new waste list
-        "CO2": 900775,
-        "TRL": 5
-    },
-    2030: {
-        "Revenue": 930371089,
-        "Profit": -339602725,
-        "Cashflow": 540429564,
-        "Waste": 161987703,  # ← updated
-        "CO2": 846583,
-        "TRL": 5
-    },
-    2040: {
-        "Revenue": 1022918520,
-        "Profit": -216342744,
-        "Cashflow": 1700833067,
-        "Waste": 168791186,  # ← updated
-        "CO2": 720135,
-        "TRL": 6
-    },
-    2050: {
-        "Revenue": 1046588625,
-        "Profit": 470020020,
-        "Cashflow": 5057688490,
-        "Waste": 175880416,  # ← updated
-        "CO2": 575623,
-        "TRL": 6
-    }
-}
 
-baseline_kpis = {
-    2030: {
-        "Revenue": 1131483298.91,
-        "Profit": 249046359,
-        "Cashflow": 249046350,
-        "Waste": 163328532,
-        "CO2": 900775,
-        "TRL": 9
-    },
-    2040: {
-        "Revenue": 1173365667.52,
-        "Profit": 259721960.62,
-        "Cashflow": 2798225761,
-        "Waste": 171932393,
-        "CO2": 945814,
-        "TRL": 9
-    },
-    2050: {
-        "Revenue": 1247033426.61,
-        "Profit": 272730401.73,
-        "Cashflow": 5466991792,
-        "Waste": 188960715,
-        "CO2": 993105,
-        "TRL": 9
-    }
-}
+@data_cache(max_entries=16)
+def seasonal_series(_store, digest, resolution, amplitude, peak_month):
+    import ecofly_seasonal
+    profile = ecofly_seasonal.seasonal_profile(amplitude, peak_month)
+    return ecofly_seasonal.emissions_series(_store, resolution, profile)
 
 
+@data_cache(max_entries=64)
+def seasonal_figure(_store, digest, resolution, amplitude, peak_month, scenarios, window):
+    import ecofly_figures
+    import ecofly_seasonal
+    t, values = seasonal_series(_store, digest, resolution, amplitude, peak_month)
+    rows = values[[_store.scenario_index[s] for s in scenarios]]
+    series = dict(zip(scenarios, ecofly_seasonal.visible_points(t, rows, window)))
+    return ecofly_figures.seasonal_figure(series, resolution, window)
+
+
+@data_cache(max_entries=16)
+def portfolio_front(_store, digest, investments, budget, min_trl, min_profit, step):
+    import ecofly_optimizer
+    return ecofly_optimizer.optimize_portfolio(_store, budget, min_trl, min_profit, step, investments=dict(investments))
+
+
+@data_cache(max_entries=16)
+def pareto_figure(_store, digest, investments, budget, min_trl, min_profit, step):
+    import ecofly_figures
+    import ecofly_optimizer
+    front = portfolio_front(_store, digest, investments, budget, min_trl, min_profit, step)
+    return ecofly_figures.pareto_figure(front, ecofly_optimizer.scenario_totals(_store))
+
+
+@resource_cache(max_entries=4)
+def flight_emissions(_raw, digest):
+    import ecofly_flights
+    import ecofly_prewarm
+    shared = ecofly_prewarm.attach("flight_emissions", digest)
+    if shared is not None:
+        return shared
+    result = ecofly_flights.simulate_flights(_raw.scenarios)
+    return result, ecofly_flights.flight_store(result, ecofly_flights.calibration(result, _raw))
+
+
+@data_cache(max_entries=32)
+def finance_sweep(_store, digest, investments, rates, inflations, base_inflation):
+    import ecofly_finance
+    return ecofly_finance.financials(_store, rates, inflations, base_inflation, dict(investments))
+
+
+@resource_cache(max_entries=8)
+def sensitivity_sweep(_raw, digest, assumptions, interpolation, investments):
+    # Every scenario, year and metric at once: switching them only slices.
+    # A resource, not data: the read-only result is shared rather than copied per rerun.
+    import ecofly_prewarm
+    import ecofly_sensitivity
+    shared = ecofly_prewarm.attach("sensitivity_sweep", digest, assumptions, interpolation, investments)
+    if shared is not None:
+        return shared
+    return ecofly_sensitivity.sensitivity(assumptions, _raw, interpolation=interpolation, investments=dict(investments))
+
+
+@data_cache(max_entries=16)
+def comparison_table(_store, digest, year, investments):
+    import ecofly_figures
+    investments = dict(investments)
+    return ecofly_figures.comparison_table(_store, year, list(investments), investments)
 
-def get_kpi(scenario, year, investment):
-    if scenario == "Scenario 4 – Train for SH flights" and year in train_kpis:
-        data = train_kpis[year]
-    elif scenario == "Scenario 1 – Drop-in SAF" and year in saf_kpis:
-        data = saf_kpis[year]
-    elif scenario == "Scenario 3 – Battery Electric" and year in eflight_kpis:
-        data = eflight_kpis[year]
-    elif scenario == "Best Scenario – Hybrid" and year in best_kpis:
-        data = best_kpis[year]
-    elif scenario == "Scenario 2 – Green Hydrogen" and year in h2_kpis:
-        data = h2_kpis[year]
-    elif scenario == "Baseline (No Innovation)" and year in baseline_kpis:  # 👈 Add this line
-        data = baseline_kpis[year]
-    else:
-        return "-", "-", "-", "-", "-", "-"
-
-    return (
-        data["Revenue"],
-        data["Profit"],
-        data["Cashflow"],
-        data["Waste"],
-        data["CO2"],
-        data["TRL"]
-    )
 
+@data_cache(max_entries=64)
+def comparison_query(_store, digest, year, investments, sort_by, ascending, search, min_trl):
+    import ecofly_figures
+    df = comparison_table(_store, digest, year, investments)
+    return ecofly_figures.query_comparison(df, sort_by, ascending, search, min_trl)
+
+
+@data_cache(max_entries=64)
+def comparison_bar_figure(_store, digest, year, investments, sort_by, ascending, search, min_trl):
+    import ecofly_figures
+    df = comparison_query(_store, digest, year, investments, sort_by, ascending, search, min_trl)
+    return ecofly_figures.comparison_bar_figure(df, year)
+
+
+if os.environ.get("ECOFLY_API_PORT"):
+    kpi_api(int(os.environ["ECOFLY_API_PORT"]))
 
 # --------------------------
 # Sidebar Navigation
@@ -209,10 +178,137 @@ menu = st.sidebar.selectbox(
     ["Home", "Fleet Information", "Key Assumptions", "Scenario Configuration", "Scenario Comparison", "Best Scenario🏆"]
 )
 
+# --------------------------
+# Model Assumptions
+# --------------------------
+def percent_input(label, value):
+    return round(st.number_input(f"{label} (%)", value=round(value * 100, 2), step=0.1, format="%.1f") / 100, 6)
+
+
+with st.sidebar.expander("⚙️ Model assumptions"):
+    d = DEFAULT_ASSUMPTIONS
+    assumptions = Assumptions(
+        cost_of_capital=percent_input("Cost of capital", d.cost_of_capital),
+        inflation=percent_input("Inflation", d.inflation),
+        pax_growth=percent_input("PAX growth", d.pax_growth),
+        cargo_growth=percent_input("Cargo growth", d.cargo_growth),
+        train_price=st.number_input("Train ticket price (€)", value=d.train_price, step=5.0),
+        sh_price=st.number_input("SH ticket price (€/hour)", value=d.sh_price, step=5.0),
+        lh_price=st.number_input("LH ticket price (€/hour)", value=d.lh_price, step=5.0),
+        pax_sh=st.number_input("PAX SH", value=d.pax_sh, step=10.0),
+        pax_lh=st.number_input("PAX LH", value=d.pax_lh, step=10.0),
+        pax_train=st.number_input("PAX Train", value=d.pax_train, step=10.0),
+        fuel_price=st.number_input("Fuel price index", value=d.fuel_price, step=0.05),
+        saf_price=st.number_input("SAF price index", value=d.saf_price, step=0.05),
+    )
+    interpolation = st.selectbox(
+        "Interpolation between KPI years", INTERPOLATION_METHODS,
+        help="Cashflow and TRL always step: they change with investment rounds and assessments.",
+    )
+
+
+# --------------------------
+# KPI data
+# --------------------------
+KPI_MODULES = (
+    "numpy", "pandas", "plotly.graph_objects",
+    "ecofly_kpis", "ecofly_format", "ecofly_simulation", "ecofly_datasource", "ecofly_optimizer", "ecofly_seasonal",
+    "ecofly_sensitivity", "ecofly_ranking", "ecofly_figures",
+)
+
+
+def load_kpis():
+    """KPI data plus raw and assumption-adjusted stores, for the pages that show KPIs."""
+    lazy_import(*KPI_MODULES)
+    source = kpi_source()
+    data = source.current()
+    if source.error:
+        st.sidebar.warning(f"KPI data file could not be loaded, showing the last good data ({source.error})")
+    raw_store = data.store
+    investments = tuple(data.investments.items())
+    return data, raw_store, simulated_store(raw_store, raw_store.digest, assumptions, interpolation, investments)
+
+
+def fragment(func):
+    """st.fragment that records its own reruns, which skip the page dispatch."""
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        if recording_active():
+            return func(*args, **kwargs)
+        with recording(f"{menu} › {func.__name__}", perf_enabled(st.query_params)):
+            return func(*args, **kwargs)
+    return st.fragment(run)
+
+
+def current_returns(store, investments):
+    a = assumptions
+    return finance_sweep(store, store.digest, investments, (a.cost_of_capital,), (a.inflation,), a.inflation)
+
+
+def plotly_chart(fig):
+    with stage("st.plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def snapshot_link(store, raw_store, scenario):
+    # Static copy of the chart, for sharing without a Streamlit session
+    import ecofly_snapshots
+    if not st.get_option("server.enableStaticServing"):
+        return
+    view = f"{ecofly_snapshots.trend_kind(scenario)}/{ecofly_snapshots.slug(scenario)}"
+    path = ecofly_snapshots.snapshot_file(store, None, raw_store, view, "html")
+    if path is not None:
+        st.caption(f"[Static version of this chart]({ecofly_snapshots.snapshot_url(path)})")
+
+
+@fragment
+def show_seasonal(store, scenario):
+    # Sub-annual emissions; the date range acts as the zoom, and each trace is
+    # downsampled to a fixed point budget within it.
+    import calendar
+    import datetime
+
+    import ecofly_seasonal
+
+    c1, c2, c3 = st.columns(3)
+    resolution = c1.selectbox("Resolution", list(ecofly_seasonal.RESOLUTIONS))
+    amplitude = c2.slider("Seasonal swing (± %)", 0, 30, round(ecofly_seasonal.SEASONAL_AMPLITUDE * 100)) / 100
+    peak_month = c3.selectbox(
+        "Peak month", range(1, 13), index=ecofly_seasonal.PEAK_MONTH - 1, format_func=lambda m: calendar.month_name[m]
+    )
+    scenarios = st.multiselect("Scenarios", store.scenarios, default=[scenario], key="seasonal_scenarios")
+    first, last = datetime.date(store.years[0], 1, 1), datetime.date(store.years[-1], 12, 31)
+    window = st.slider("Zoom", min_value=first, max_value=last, value=(first, last), format="MMM YYYY")
+    if scenarios:
+        plotly_chart(seasonal_figure(store, store.digest, resolution, amplitude, peak_month, tuple(scenarios), window))
+
+
+def show_trend(fig, raw_store, investments, years, scenario, key):
+    import ecofly_figures
+    # Emissions trend chart, optionally with Monte Carlo P5/P50/P95 bands
+    if not st.toggle("Show uncertainty bands (Monte Carlo)", key=f"{key}_mc"):
+        plotly_chart(fig)
+        return
+    n_samples = st.select_slider("Samples", options=[1_000, 10_000, 100_000], value=10_000, key=f"{key}_samples")
+    bands = monte_carlo_bands(raw_store, raw_store.digest, assumptions, interpolation, investments, scenario, n_samples)
+    ecofly_figures.add_uncertainty_bands(fig, years, bands["CO2"], "CO₂")
+    plotly_chart(fig)
+    plotly_chart(ecofly_figures.cashflow_band_figure(years, bands["Cashflow"]))
+
+
+@fragment
+def trend_panel(store, raw_store, investments, scenario, key):
+    # Toggling the uncertainty bands only reruns the chart
+    from ecofly_kpis import BEST_SCENARIO
+    build = hybrid_trend_figure if scenario == BEST_SCENARIO else emissions_trend_figure
+    fig = build(store, store.digest, raw_store, scenario, tuple(raw_store.known_years(scenario)))
+    show_trend(fig, raw_store, investments, store.years, scenario, key)
+    snapshot_link(store, raw_store, scenario)
+
 # --------------------------
 # HOME PAGE
 # --------------------------
-if menu == "Home":
+def render_home():
     st.markdown("""
     # Welcome to the EcoFly Sustainability & Innovation Dashboard 
     """)
@@ -228,7 +324,11 @@ if menu == "Home":
     Use the sidebar on the left to explore the sections.
     """)
 
-    st.image(logo, use_container_width=True)
+    variants = logo_variants()
+    if st.get_option("server.enableStaticServing"):
+        st.html(ecofly_assets.logo_html(variants))
+    else:
+        st.image(str(dict(variants["webp"])[960]), use_container_width=True)
 
     st.info("""
     ## COL 4, Group 3
@@ -243,7 +343,7 @@ if menu == "Home":
 # --------------------------
 # FLEET INFORMATION
 # --------------------------
-elif menu == "Fleet Information":
+def render_fleet():
     st.header("Fleet Information")
     st.info("""
 *EcoFly*, a Dutch leisure airline, began operations in **FY24/25** from Lelystad Airport with:  
@@ -272,29 +372,65 @@ Each option will be evaluated based on key performance indicators (KPIs) such as
 Through scenario modeling, we aim to determine which innovation—or combination—is the most effective and realistic pathway for EcoFly’s growth and decarbonization.
 """)
 
-elif menu == "Best Scenario🏆":
-    st.header("SAF + Train Hybrid Strategy")
+    st.subheader("Bottom-up Flight Emissions")
+    # Only on request: the KPI data and the flight model are heavy, and the
+    # rest of this page is text.
+    if st.toggle("Show bottom-up flight emissions", key="flight_emissions"):
+        data, raw_store, store = load_kpis()
+        show_flight_emissions(store, raw_store)
+
+
+@fragment
+def show_flight_emissions(store, raw_store):
+    # Every scheduled flight's fuel burn and CO₂, summed per route and
+    # aircraft type; calibrated on the baseline to the KPI tables' CO₂.
+    import ecofly_figures
+    from ecofly_format import format_number
+
+    result, flights = flight_emissions(raw_store, raw_store.digest)
+    c1, c2 = st.columns(2)
+    scenario = c1.selectbox("Scenario", flights.scenarios, key="flight_scenario")
+    year = c2.select_slider("Year", options=flights.years, value=2030, key="flight_year")
+    n, fuel, co2 = (flights.value(scenario, year, m) for m in ("Flights", "Fuel", "CO2"))
+    cols = st.columns(4)
+    cols[0].metric("Flights", f"{n:,.0f}")
+    cols[1].metric("Fuel (ton, kerosene eq.)", format_number(fuel))
+    cols[2].metric("Emissions (ton)", f"{format_number(co2)} CO₂")
+    cols[3].metric("KPI model emissions", f"{format_number(store.value(scenario, year, 'CO2'))} CO₂")
+    plotly_chart(ecofly_figures.flight_breakdown_figure(result, scenario, year))
+
+    st.caption(
+        "The flight model is calibrated to the KPI tables on the baseline only. For the other scenarios the "
+        "two disagree wherever the tables assume more or less than the schedule models, e.g. Scenario 3's "
+        "tables put CO₂ at zero from 2040 while its long-haul flights still burn kerosene. Gap in %, blank "
+        "where the KPI model has no positive figure."
+    )
+    with stage("st.dataframe"):
+        st.dataframe(
+            ecofly_figures.flight_gap_table(flights, store, year),
+            column_config={
+                "Bottom-up": st.column_config.NumberColumn("Bottom-up (ton CO₂)", format="compact"),
+                "KPI model": st.column_config.NumberColumn("KPI model (ton CO₂)", format="compact"),
+                "Gap": st.column_config.NumberColumn("Gap", format="%+.1f%%"),
+            },
+            hide_index=True,
+        )
 
-    selected_year = st.select_slider("Select Snapshot Year", options=[2030, 2040, 2050], value=2030)
-    scenario = "Best Scenario – Hybrid"
+def render_best():
+    from ecofly_kpis import BEST_SCENARIO
 
-    revenue, profit, cashflow, waste, emissions, trl = get_kpi(scenario, selected_year, 0)
+    data, raw_store, store = load_kpis()
+    st.header("SAF + Train Hybrid Strategy")
 
-    cols = st.columns(6)
-    cols[0].metric("Revenue", f"€{format_number(revenue)}" if revenue != "-" else "-")
-    cols[1].metric("Profit", f"€{format_number(profit)}")
-    cols[2].metric("Cashflow", f"€{format_number(cashflow)}")
-    cols[3].metric("Emissions (ton)", f"{format_number(emissions)} CO₂")
-    cols[4].metric("Waste", f"{format_number(waste, ' ton')}")
-    cols[5].metric("TRL", f"{trl}/9")
+    scenario = BEST_SCENARIO
+    if scenario not in store.scenario_index:
+        st.warning(f"The loaded KPI data has no “{scenario}” scenario.")
+        st.stop()
+    best_metrics(store, scenario)
 
     st.subheader("Hybrid Emissions Trend")
-    years = [2030, 2040, 2050]
-    trend = [best_kpis[y]["CO2"] for y in years]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=years, y=trend, mode='lines+markers', name="Hybrid Emissions"))
-    fig.update_layout(title="Projected CO₂ Emissions", xaxis_title="Year", yaxis_title="ton CO₂")
-    st.plotly_chart(fig, use_container_width=True)
+    investments = tuple(data.investments.items())
+    trend_panel(store, raw_store, investments, scenario, "best")
     st.markdown("""
 ### EcoFly’s Hybrid Decarbonization Strategy – Train + SAF Integration
 
@@ -360,71 +496,293 @@ EcoFly’s hybrid strategy:
 
 This isn’t yet 100% carbon-free but it’s the **smartest and fastest route to realistic decarbonization** for EcoFly and our passengers.
     """)
+    show_portfolio_optimizer(store, investments)
+    show_ranking(store)
+
+
+@fragment
+def show_ranking(store):
+    # Recomputed on every weight change; one pass ranks all scenarios in all years.
+    import ecofly_figures
+    import ecofly_ranking
+
+    st.subheader("Multi-criteria Ranking")
+    st.caption(
+        "Scores every scenario against the others in the same year on all KPIs; "
+        "Waste and CO₂ count as costs, the rest as benefits. A weight of 0 leaves a KPI out."
+    )
+    c1, c2, c3 = st.columns(3)
+    method = c1.radio("Method", ecofly_ranking.METHODS, index=1, horizontal=True)
+    normalization = c2.selectbox(
+        "Normalization", ecofly_ranking.NORMALIZATIONS,
+        index=ecofly_ranking.NORMALIZATIONS.index(ecofly_ranking.DEFAULT_NORMALIZATION[method]),
+    )
+    year = c3.select_slider("Ranking year", options=store.years, value=min(2050, store.years[-1]))
+    cols = st.columns(len(ecofly_ranking.CRITERIA))
+    weights = {c: col.slider(f"{c} weight", 0, 10, 5) for c, col in zip(ecofly_ranking.CRITERIA, cols)}
+    if not any(weights.values()):
+        st.info("Give at least one KPI a weight.")
+        return
+
+    result = ecofly_ranking.rank_scenarios(store, weights, method, normalization)
+    df = ecofly_figures.ranking_table(result, year, top_n=25)
+    with stage("st.dataframe"):
+        st.dataframe(
+            df, hide_index=True,
+            column_config={"Score": st.column_config.ProgressColumn("Score", format="%.3f", min_value=0, max_value=1)}
+            if normalization == "min-max" or method == "TOPSIS" else None,
+        )
+    plotly_chart(ecofly_figures.rank_trend_figure(result, list(df["Scenario"][:10])))
+
+
+@fragment
+def best_metrics(store, scenario):
+    # Scrubbing the year only reruns this block
+    from ecofly_format import format_number
+
+    selected_year = st.select_slider("Select Snapshot Year", options=store.years, value=2030)
+    revenue, profit, cashflow, waste, emissions, trl = store.get_kpi(scenario, selected_year)
+
+    cols = st.columns(6)
+    cols[0].metric("Revenue", f"€{format_number(revenue)}" if revenue != "-" else "-")
+    cols[1].metric("Profit", f"€{format_number(profit)}")
+    cols[2].metric("Cashflow", f"€{format_number(cashflow)}")
+    cols[3].metric("Emissions (ton)", f"{format_number(emissions)} CO₂")
+    cols[4].metric("Waste", f"{format_number(waste, ' ton')}")
+    cols[5].metric("TRL", f"{trl}/9")
+    no_data_note(store, scenario, selected_year)
+
+
+@fragment
+def show_portfolio_optimizer(store, investments):
+    import ecofly_figures
+    from ecofly_kpis import BASELINE
+
+    st.subheader("Portfolio Optimizer")
+    if BASELINE not in store.scenario_index:
+        st.info(f"The optimizer measures every technology against “{BASELINE}”, which the loaded KPI data lacks.")
+        return
+    st.caption(
+        "Searches SAF, hydrogen, battery-electric and train shares per decade (2030/2040/2050) "
+        "and keeps the mixes no other mix beats on both cumulative CO₂ and cumulative cashflow."
+    )
+    c1, c2, c3, c4 = st.columns(4)
+    budget = c1.number_input("Investment budget (€B)", min_value=0.5, max_value=20.0, value=4.0, step=0.5)
+    min_trl = c2.slider("Minimum TRL", 1, 9, 6, key="optimizer_trl")
+    min_profit = c3.number_input("Minimum yearly profit (€M)", value=0.0, step=50.0)
+    step = c4.selectbox("Share step", [0.25, 0.1], format_func=lambda s: f"{s:.0%}")
+    query = (investments, budget * 1e9, min_trl, min_profit * 1e6, step)
+
+    with st.spinner("Searching technology portfolios…"):
+        front = portfolio_front(store, store.digest, *query)
+    if not len(front.co2):
+        st.info("No portfolio meets these constraints.")
+        return
+    plotly_chart(pareto_figure(store, store.digest, *query))
+    span = f"{front.years[0]}–{front.years[-1]}"
+    with stage("st.dataframe"):
+        st.dataframe(
+            ecofly_figures.portfolio_table(front),
+            column_config={
+                "CO2": st.column_config.NumberColumn(f"Emissions {span} (ton CO₂)", format="compact"),
+                "Cashflow": st.column_config.NumberColumn(f"Cashflow {span} (€)", format="compact"),
+                "Investment": st.column_config.NumberColumn("Investment (€)", format="compact"),
+                "TRL": st.column_config.NumberColumn("TRL", format="%d/9"),
+            },
+            hide_index=True,
+        )
+    st.caption(
+        f"{front.candidates:,} portfolios on the grid, {front.evaluated:,} scored after pruning, "
+        f"{front.feasible:,} within the profit limit, {len(front.co2)} on the front. Shares in %."
+    )
 
 # --------------------------
 # ASSUMPTIONS
 # --------------------------
-elif menu == "Key Assumptions":
+def render_assumptions():
     st.header("Assumptions")
-    st.info("""
+    a = assumptions
+    st.info(f"""
 
 #### 💰 Financial Assumptions
-- **Cost of capital:** 3.5%  
-- **Inflation (industrial goods):** 1.5%
+- **Cost of capital:** {a.cost_of_capital:.1%}  
+- **Inflation (industrial goods):** {a.inflation:.1%}
 
 #### ✈️ Growth Forecasts (2025–2041)
-- **Passenger (PAX) growth forecast:** 4.2%  
-- **Cargo growth forecast:** 4.5%
+- **Passenger (PAX) growth forecast:** {a.pax_growth:.1%}  
+- **Cargo growth forecast:** {a.cargo_growth:.1%}
 
 #### 🎟 Ticket Pricing
-- **Train ticket price:** €100 (total)  
-- **Short-haul (SH) ticket price:** €80/hour  
-- **Long-haul (LH) ticket price:** €100/hour
+- **Train ticket price:** €{a.train_price:g} (total)  
+- **Short-haul (SH) ticket price:** €{a.sh_price:g}/hour  
+- **Long-haul (LH) ticket price:** €{a.lh_price:g}/hour
 
 #### 📊 Baseline Pax Volumes (starting FY25/26)
-- **PAX SH (Short-Haul):** 180  
-- **PAX LH (Long-Haul):** 300  
-- **PAX Train:** 350
+- **PAX SH (Short-Haul):** {a.pax_sh:g}  
+- **PAX LH (Long-Haul):** {a.pax_lh:g}  
+- **PAX Train:** {a.pax_train:g}
     """)
+    st.caption("Adjust these in the sidebar under ⚙️ Model assumptions; all KPIs recompute live.")
 
 # --------------------------
 # SCENARIO COMPARISON
 # --------------------------
-elif menu == "Scenario Comparison":
-    st.header("Scenario Comparison – KPIs in 2050")
-    data = []
-    for scen, inv in investments.items():
-        revenue, profit, cashflow, waste, emissions, trl = get_kpi(scen, 2050, inv)
-        data.append({
-    "Scenario": scen,
-    "Emissions CO₂": emissions,  # numeric for plotting
-    "Emissions(ton)": f"{format_number(emissions)} CO₂",  # pretty for display
-    "Waste": format_number(waste, " ton"),
-    "TRL": f"{trl}/9",
-    "Revenue": f"€{format_number(revenue)}",
-    "Profit": f"€{format_number(profit)}",
-    "Cashflow": f"€{format_number(cashflow)}"
-})
-
-
-    df = pd.DataFrame(data)
-
-    with st.expander("📊 Click to view full KPI comparison table (2050)"):
-        st.dataframe(df.set_index("Scenario"))
-
-    fig2 = px.bar(df, x="Emissions CO₂", y="Scenario", orientation='h', title="2050 Emissions by Scenario")
-    st.plotly_chart(fig2, use_container_width=True)
+def render_comparison():
+    data, raw_store, store = load_kpis()
+    header = st.empty()
+    year = st.select_slider("Comparison year", options=store.years, value=min(2050, store.years[-1]))
+    header.header(f"Scenario Comparison – KPIs in {year}")
+
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 2])
+    search = c1.text_input("Filter scenarios", placeholder="name contains…")
+    sort_by = c2.selectbox("Sort by", ["CO2", "Revenue", "Profit", "Cashflow", "Waste", "TRL", "Investment", "Scenario"])
+    descending = c3.toggle("Descending")
+    min_trl = c4.slider("Minimum TRL", 1, 9, 1)
+
+    investments = tuple(data.investments.items())
+    query = (year, investments, sort_by, not descending, search, min_trl)
+    df = comparison_query(store, store.digest, *query)
+
+    page_size = 25
+    pages = max(1, -(-len(df) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    first = (page - 1) * page_size
+    with stage("st.dataframe"):
+        st.dataframe(
+            df.iloc[first:first + page_size].set_index("Scenario"),
+            column_config={
+                "Revenue": st.column_config.NumberColumn("Revenue (€)", format="compact"),
+                "Profit": st.column_config.NumberColumn("Profit (€)", format="compact"),
+                "Cashflow": st.column_config.NumberColumn("Cashflow (€)", format="compact"),
+                "Waste": st.column_config.NumberColumn("Waste (ton)", format="compact"),
+                "CO2": st.column_config.NumberColumn("Emissions (ton CO₂)", format="compact"),
+                "TRL": st.column_config.NumberColumn("TRL", format="%d/9"),
+                "Investment": st.column_config.NumberColumn("Investment (€M)", format="%d"),
+            },
+        )
+    st.caption(f"Rows {min(first + 1, len(df))}–{min(first + page_size, len(df))} of {len(df)}")
+
+    fig2 = comparison_bar_figure(store, store.digest, *query)
+    plotly_chart(fig2)
+
+    st.subheader("Investment Returns")
+    show_returns(store, investments)
+
+    st.subheader("Data Export")
+    show_export(data, store)
+
+
+@fragment
+def show_export(data, store):
+    # Whole tables for use outside the dashboard. The file is written (or
+    # found in the export cache) only when the button is clicked.
+    import ecofly_export
+
+    tables = ecofly_export.standard_tables(data, store)
+    labels = {
+        "kpi_tables": "KPI tables (as loaded)", "annual_kpis": "Annual KPIs (current assumptions)",
+        "monthly_emissions": "Monthly CO₂", "weekly_emissions": "Weekly CO₂", "daily_emissions": "Daily CO₂",
+    }
+    c1, c2, c3 = st.columns([3, 1, 1], vertical_alignment="bottom")
+    name = c1.selectbox("Table", list(tables), format_func=lambda t: labels.get(t, t), key="export_table")
+    fmt = c2.selectbox("Format", list(ecofly_export.FORMATS), format_func=str.upper, key="export_format")
+    table = tables[name]
+    c3.download_button(
+        "Download", lambda: ecofly_export.export_file(table, fmt).read_bytes(),
+        file_name=ecofly_export.download_name(table, fmt), mime=ecofly_export.FORMATS[fmt], on_click="ignore",
+    )
+
+
+@fragment
+def show_returns(store, investments):
+    # NPV / IRR / payback of each investment plan at the sidebar assumptions,
+    # then NPV over a discount rate × inflation sweep
+    import numpy as np
+
+    import ecofly_figures
+
+    current = current_returns(store, investments)
+    with stage("st.dataframe"):
+        st.dataframe(
+            ecofly_figures.returns_table(current),
+            column_config={
+                "Investment": st.column_config.NumberColumn("Investment (€)", format="compact"),
+                "NPV": st.column_config.NumberColumn(f"NPV @ {assumptions.cost_of_capital:.1%} (€)", format="compact"),
+                "IRR": st.column_config.NumberColumn("IRR", format="%.1f%%"),
+                "Payback": st.column_config.NumberColumn("Payback year", format="%d"),
+            },
+            hide_index=True,
+        )
+    plotly_chart(ecofly_figures.cumulative_cashflow_figure(current))
+
+    c1, c2, c3 = st.columns(3)
+    rates = c1.slider("Discount rates (%)", 0.0, 20.0, (0.0, 10.0), 0.5)
+    inflations = c2.slider("Inflation rates (%)", 0.0, 8.0, (0.0, 4.0), 0.25)
+    scenario = c3.selectbox("Scenario", store.scenarios, key="npv_scenario")
+    grid = [tuple(np.round(np.linspace(lo, hi, 21) / 100, 6).tolist()) for lo, hi in (rates, inflations)]
+    sweep = finance_sweep(store, store.digest, investments, *grid, assumptions.inflation)
+    plotly_chart(ecofly_figures.npv_heatmap_figure(sweep, scenario))
+    st.caption(
+        "Net cash flow is profit minus the investments paid out that year, discounted to 2025. "
+        "Years before a scenario's first KPI year are assumed to earn that year's profit. "
+        f"{len(grid[0]) * len(grid[1])} rate combinations; investments are fixed nominal amounts."
+    )
 
 # --------------------------
 # SCENARIO CONFIGURATION
 # --------------------------
-elif menu == "Scenario Configuration":
+def render_configuration():
+    data, raw_store, store = load_kpis()
     st.header("Scenario Configuration & KPIs")
-    scenario = st.selectbox("Choose a scenario:", list(investments.keys()))
-    selected_year = st.select_slider("Select Snapshot Year", options=[2030, 2040, 2050], value=2030)
-    investment = investments[scenario]
+    scenario_panel(store, raw_store, tuple(data.investments.items()))
 
-    revenue, profit, cashflow, waste, emissions, trl = get_kpi(scenario, selected_year, investment)
+
+@fragment
+def scenario_panel(store, raw_store, investments):
+    # A new scenario reruns this panel, not the sidebar and page setup; the
+    # year slider and the charts below rerun on their own.
+    scenario = st.selectbox("Choose a scenario:", [s for s, _ in investments])
+    scenario_metrics(store, scenario)
+    return_metrics(store, investments, scenario)
+
+    st.subheader("Emissions Trend")
+    trend_panel(store, raw_store, investments, scenario, "config")
+
+    st.subheader("Seasonal Emissions")
+    show_seasonal(store, scenario)
+
+    st.subheader("Sensitivity")
+    show_sensitivity(raw_store, investments, scenario)
+    scenario_narrative(scenario)
+
+
+@fragment
+def show_sensitivity(raw_store, investments, scenario):
+    # Tornado of every input one at a time, and a heat map of any two
+    # together; all from one cached sweep of the current assumptions.
+    import ecofly_figures
+
+    result = sensitivity_sweep(raw_store, raw_store.digest, assumptions, interpolation, investments)
+    c1, c2 = st.columns(2)
+    year = c1.select_slider("Year", options=result.years, value=2050, key="sensitivity_year")
+    metric = c2.selectbox("KPI", ["CO2", "Profit", "Cashflow", "Revenue", "Waste"], key="sensitivity_metric")
+    plotly_chart(ecofly_figures.tornado_figure(result, scenario, year, metric))
+
+    labels = dict(zip(result.factors, result.labels))
+    c1, c2 = st.columns(2)
+    first = c1.selectbox("Input on x", result.factors, format_func=labels.get, key="sensitivity_x")
+    others = [f for f in result.factors if f != first]
+    second = c2.selectbox("Input on y", others, index=others.index("pax_growth") if "pax_growth" in others else 0,
+                          format_func=labels.get, key="sensitivity_y")
+    plotly_chart(ecofly_figures.sensitivity_heatmap_figure(result, first, second, scenario, year, metric))
+
+
+@fragment
+def scenario_metrics(store, scenario):
+    from ecofly_format import format_number
+
+    selected_year = st.select_slider("Select Snapshot Year", options=store.years, value=2030)
+    revenue, profit, cashflow, waste, emissions, trl = store.get_kpi(scenario, selected_year)
 
     cols = st.columns(6)
     cols[0].metric("Revenue", f"€{format_number(revenue)}")
@@ -433,34 +791,34 @@ elif menu == "Scenario Configuration":
     cols[3].metric("Emissions(ton)", f"{format_number(emissions)} CO₂")
     cols[4].metric("Waste", f"{format_number(waste)} ton")
     cols[5].metric("TRL", f"{trl}/9")
- 
-    st.subheader("Emissions Trend")
-    if scenario != "Scenario 4 – Train for SH flights":
-        years = [2030, 2040, 2050]
-        trend_data = [get_kpi(scenario, y, investment)[4] for y in years]
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=years, y=trend_data, mode='lines+markers', name="Emissions ton CO₂"))
-    else:
-        years_full = np.arange(2030, 2051)
-        base_emissions = np.interp(
-            years_full,
-            [2030, 2040, 2050],
-            [train_kpis[2030]["CO2"], train_kpis[2040]["CO2"], train_kpis[2050]["CO2"]]
-        )
-        summer_spike = 1 + 0.04 * np.sin(2 * np.pi * (years_full - 2030))
-        emissions_with_spike = base_emissions * summer_spike
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=years_full, y=emissions_with_spike, mode='lines', name="Emissions ton CO₂"))
-        fig.add_trace(go.Scatter(
-            x=[2030, 2040, 2050],
-            y=[train_kpis[2030]["CO2"], train_kpis[2040]["CO2"], train_kpis[2050]["CO2"]],
-            mode='markers',
-            marker=dict(size=10),
-            name="KPI Points"
-        ))
-
-    fig.update_layout(title="Projected Emissions (ton CO₂)", xaxis_title="Year", yaxis_title="Emissions")
-    st.plotly_chart(fig, use_container_width=True)
+    no_data_note(store, scenario, selected_year)
+
+
+def no_data_note(store, scenario, year):
+    # Years before or after a scenario's KPI tables are not extrapolated
+    known = [y for y, missing in zip(store.years, store.missing[store.scenario_index[scenario]].all(axis=1))
+             if not missing]
+    if known and not known[0] <= year <= known[-1]:
+        st.caption(f"No KPI data for {year}: the figures for this scenario cover {known[0]}–{known[-1]}.")
+
+
+def return_metrics(store, investments, scenario):
+    # 2025–2050 returns on the scenario's investment plan, at the sidebar assumptions
+    import math
+
+    from ecofly_format import format_number
+
+    result = current_returns(store, investments)
+    s = result.scenarios.index(scenario)
+    npv, irr, payback = result.npv[0, 0, s], result.irr[0, s], result.payback[0, 0, s]
+    cols = st.columns(6)
+    cols[0].metric("Investment", f"€{format_number(result.investment[s])}")
+    cols[1].metric(f"NPV @ {assumptions.cost_of_capital:.1%}", f"€{format_number(npv)}")
+    cols[2].metric("IRR", "-" if math.isnan(irr) else f"{irr:.1%}")
+    cols[3].metric("Payback year", "Not by " + str(store.years[-1]) if math.isnan(payback) else str(int(payback)))
+
+
+def scenario_narrative(scenario):
     # Scenario-specific explanatory texts
     if scenario == "Scenario 1 – Drop-in SAF":
         st.markdown("""
@@ -590,3 +948,27 @@ To remain competitive during this transition, EcoFly will retain **25% of SH fli
 
 **Note:** Long-haul (LH) flights remain part of our operations. Emissions figures therefore reflect all emissions: SH flights, trains, and LH flights. Our own rail infrastructure is a future goal; until then, we use the existing network where possible.
         """)
+
+
+# --------------------------
+# Page dispatch
+# --------------------------
+PAGES = {
+    "Home": render_home,
+    "Fleet Information": render_fleet,
+    "Key Assumptions": render_assumptions,
+    "Scenario Configuration": render_configuration,
+    "Scenario Comparison": render_comparison,
+    "Best Scenario🏆": render_best,
+}
+
+with first_render(menu), recording(menu, perf_enabled(st.query_params)) as metrics:
+    PAGES[menu]()
+
+if metrics is not None and perf_enabled(st.query_params):
+    with st.sidebar.expander("🔧 Performance (this rerun)"):
+        st.markdown(rerun_report_markdown(metrics))
+
+if startup_report_enabled(st.query_params):
+    with st.sidebar.expander("⏱ Startup report"):
+        st.markdown(startup_report_markdown())
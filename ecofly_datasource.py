@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from ecofly_kpis import BEST_SCENARIO, METRICS, KpiStore, investments, kpi_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # CSV files still load through pandas
+    pa = None
+
+log = logging.getLogger(__name__)
+
+# --------------------------
+# External KPI data source
+# --------------------------
+# Analysts publish a long table (Scenario, Year, one column per metric,
+# optional Investment in € million) as Parquet, Arrow IPC or CSV and point
+# ECOFLY_KPI_PATH at it. Parquet/Arrow files are memory-mapped, every
+# session of the process shares the one store built from it, and a new
+# file (by mtime) is picked up on the next rerun. Writers should replace
+# the file atomically (write elsewhere, then rename over it).
+KpiData = namedtuple("KpiData", ["store", "investments", "path"])
+
+BUILTIN = KpiData(kpi_store, dict(investments), None)
+
+
+def _read_columns(path):
+    """Column name -> numpy array.
+
+    Parquet and Arrow files are memory-mapped for the read, but to_numpy and
+    KpiStore.from_columns copy the values, so nothing stays mapped once the
+    store is built.
+    """
+    suffix = path.suffix.lower()
+    if suffix in (".parquet", ".arrow", ".feather", ".ipc"):
+        if pa is None:
+            raise ImportError(f"reading {suffix} files requires pyarrow")
+        if suffix == ".parquet":
+            table = pq.read_table(path, memory_map=True)
+        else:
+            with pa.memory_map(str(path)) as source:
+                table = pa.ipc.open_file(source).read_all()
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    if suffix == ".csv":
+        if pa is not None:
+            table = pa_csv.read_csv(path)
+            return {name: table.column(name).to_numpy() for name in table.column_names}
+        import pandas as pd
+        return {name: col.to_numpy() for name, col in pd.read_csv(path).items()}
+    raise ValueError(f"unsupported KPI file type: {path.name}")
+
+
+def load_kpi_file(path):
+    path = Path(path)
+    columns = _read_columns(path)
+    missing = {"Scenario", "Year"} - set(columns)
+    if missing:
+        raise ValueError(f"{path.name} lacks column(s): {', '.join(sorted(missing))}")
+    try:
+        store = KpiStore.from_columns(columns["Scenario"], columns["Year"], columns, METRICS)
+    except ValueError as exc:
+        raise ValueError(f"{path.name} has {exc}") from None
+    if "Investment" in columns:
+        # one figure per scenario: the first non-missing value wins
+        amounts = {}
+        for scenario, amount in zip(columns["Scenario"], np.asarray(columns["Investment"], dtype=float)):
+            if not np.isnan(amount):
+                amounts.setdefault(str(scenario), float(amount))
+        scenario_investments = {s: amounts.get(s, 0) for s in store.scenarios if s != BEST_SCENARIO}
+    else:
+        scenario_investments = {s: investments.get(s, 0) for s in store.scenarios if s != BEST_SCENARIO}
+    return KpiData(store, scenario_investments, path)
+
+
+def write_kpi_file(path, data=BUILTIN):
+    """Write a store as a long table; the format follows the file suffix."""
+    path = Path(path)
+    store = data.store
+    scen, year = np.meshgrid(np.arange(len(store.scenarios)), store.years, indexing="ij")
+    keep = ~store.missing.all(axis=2).ravel()
+    columns = {
+        "Scenario": np.asarray(store.scenarios, dtype=object)[scen.ravel()][keep],
+        "Year": np.asarray(year.ravel()[keep], dtype=np.int64),
+    }
+    for m, metric in enumerate(store.metrics):
+        columns[metric] = store.values[..., m].ravel()[keep]
+    columns["Investment"] = np.array([data.investments.get(s, np.nan) for s in columns["Scenario"]], dtype=float)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix.lower() == ".csv":
+        import pandas as pd
+        pd.DataFrame(columns).to_csv(tmp, index=False)
+    else:
+        if pa is None:
+            raise ImportError(f"writing {path.suffix} files requires pyarrow")
+        table = pa.table(columns)
+        if path.suffix.lower() == ".parquet":
+            pq.write_table(table, tmp)
+        else:
+            with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    os.replace(tmp, path)
+
+
+class KpiSource:
+    """Process-wide handle on the KPI data, reloaded when the file changes."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.error = None
+        self._data = BUILTIN
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        if self.path is None:
+            return self._data
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError as e:
+            self.error = f"{self.path}: {e.strerror}"
+            return self._data
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._reload(mtime)
+        return self._data
+
+    def _reload(self, mtime):
+        try:
+            data = load_kpi_file(self.path)
+        except Exception as e:  # keep serving the last good data
+            self.error = f"{self.path.name}: {e}"
+            log.warning("KPI reload failed, keeping previous data: %s", e)
+        else:
+            self._data = data  # single reference swap: readers see old or new, never a mix
+            self.error = None
+            log.info("loaded %s: %d scenarios × %d years", self.path, len(data.store.scenarios), len(data.store.years))
+        self._mtime = mtime
+
+
+def default_source():
+    return KpiSource(os.environ.get("ECOFLY_KPI_PATH"))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python ecofly_datasource.py OUTPUT.{parquet,arrow,csv}")
+    write_kpi_file(sys.argv[1])
+    print(f"wrote built-in KPI tables to {sys.argv[1]}")
@@ -0,0 +1,308 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import zipfile
+from collections import namedtuple
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from ecofly_perf import timed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV and XLSX exports need only NumPy and pandas
+    pa = None
+
+# --------------------------
+# Bulk data export
+# --------------------------
+# Each exportable table is a long table (one row per scenario × year, or
+# per scenario × period for the seasonal series) produced in chunks of
+# rows. Writers append chunk by chunk to a file in EXPORT_DIR, so a large
+# export never exists in memory as a whole. Files are named by a hash of
+# the data the table is built from: an identical export is served from
+# the existing file, and a changed input gives a new file.
+EXPORT_DIR = Path(os.environ.get("ECOFLY_EXPORT_DIR") or Path(tempfile.gettempdir()) / "ecofly-exports")
+EXPORT_VERSION = "3"  # bump when a table's layout or a writer's output changes
+CHUNK_ROWS = 50_000
+MAX_FILES = 64        # oldest exports (by last use) are removed beyond this
+XLSX_MAX_ROWS = 1_048_576  # Excel's sheet limit, header included; longer tables continue on a new sheet
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# name: file stem, columns: header, parts: everything the rows are derived
+# from (hashed), chunks: callable yielding {column: array} blocks of rows
+Table = namedtuple("Table", "name columns parts chunks")
+
+
+# --------------------------
+# Tables
+# --------------------------
+def store_table(name, store, investments=None, chunk_rows=CHUNK_ROWS):
+    """Scenario, Year, one column per metric (and Investment in € million), all rows with data."""
+    columns = ["Scenario", "Year", *store.metrics] + (["Investment"] if investments is not None else [])
+    invest = sorted(investments.items()) if investments is not None else None
+
+    def chunks():
+        per_chunk = max(1, chunk_rows // max(1, len(store.years)))
+        years = np.asarray(store.years, dtype=np.int64)
+        for first in range(0, len(store.scenarios), per_chunk):
+            scenarios = store.scenarios[first:first + per_chunk]
+            values = store.values[first:first + per_chunk]
+            keep = ~np.isnan(values).all(axis=2).ravel()
+            scen = np.repeat(np.asarray(scenarios, dtype=object), len(years))[keep]
+            chunk = {"Scenario": scen, "Year": np.tile(years, len(scenarios))[keep]}
+            for m, metric in enumerate(store.metrics):
+                chunk[metric] = values[..., m].ravel()[keep]
+            if investments is not None:
+                chunk["Investment"] = np.array([investments.get(s, np.nan) for s in scen], dtype=float)
+            yield chunk
+
+    return Table(name, columns, (store.scenarios, store.years, store.metrics, store.values, invest), chunks)
+
+
+def seasonal_table(store, resolution, profile=None, chunk_rows=CHUNK_ROWS):
+    """Scenario, Period (start date), CO2 at a sub-annual resolution."""
+    import ecofly_seasonal
+
+    profile = ecofly_seasonal.seasonal_profile() if profile is None else np.asarray(profile, dtype=float)
+
+    def chunks():
+        t, values = ecofly_seasonal.emissions_series(store, resolution, profile)
+        per_chunk = max(1, chunk_rows // len(t))
+        for first in range(0, len(store.scenarios), per_chunk):
+            rows = values[first:first + per_chunk]
+            yield {
+                "Scenario": np.repeat(np.asarray(store.scenarios[first:first + per_chunk], dtype=object), len(t)),
+                "Period": np.tile(t, len(rows)),
+                "CO2": rows.ravel(),
+            }
+
+    parts = (store.scenarios, store.years, store.metric("CO2"), profile, resolution)
+    return Table(f"{resolution}_emissions", ["Scenario", "Period", "CO2"], parts, chunks)
+
+
+def export_hash(table, fmt):
+    digest = hashlib.blake2b(f"{EXPORT_VERSION}|{table.name}|{fmt}|{table.columns}".encode(), digest_size=16)
+    for part in table.parts:
+        digest.update(part.tobytes() if isinstance(part, np.ndarray) else repr(part).encode())
+    return digest.hexdigest()
+
+
+# --------------------------
+# Streaming writers
+# --------------------------
+def _write_csv(path, table):
+    import pandas as pd
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(table.columns) + "\n")
+        for chunk in table.chunks():
+            pd.DataFrame(chunk, columns=table.columns).to_csv(f, header=False, index=False)
+
+
+def _write_parquet(path, table):
+    if pa is None:
+        raise ImportError("writing .parquet files requires pyarrow")
+    writer = None
+    try:
+        for chunk in table.chunks():
+            batch = pa.table({c: chunk[c] for c in table.columns})
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch.cast(writer.schema))  # one row group per chunk
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({c: [] for c in table.columns}), path)
+
+
+_EXCEL_EPOCH = np.datetime64("1899-12-30", "D")
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "{sheets}</Types>"
+    ),
+    "_rels/.rels": (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        "</Relationships>"
+    ),
+    "xl/styles.xml": (
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        "</styleSheet>"
+    ),
+}
+
+
+def _xlsx_cells(values):
+    """Cell XML per value of one column chunk.
+
+    Cells carry no ``r`` reference, so their position is their order in the
+    row: a missing or infinite value (NaN, ±inf) is written as an empty
+    ``<c/>`` to hold its column, as SpreadsheetML has no number for it.
+    """
+    if values.dtype.kind == "M":
+        serial = (values.astype("datetime64[D]") - _EXCEL_EPOCH).astype(np.int64)
+        return [f'<c s="1"><v>{v}</v></c>' for v in serial.tolist()]
+    if values.dtype.kind in "iuf":
+        finite = np.isfinite(values).tolist()
+        return [f"<c><v>{v!r}</v></c>" if ok else "<c/>" for v, ok in zip(values.tolist(), finite)]
+    return [f'<c t="inlineStr"><is><t>{escape(str(v))}</t></is></c>' for v in values.tolist()]
+
+
+def _write_xlsx(path, table):
+    # A minimal SpreadsheetML package; sheets are streamed into the zip
+    # entry row by row, with inline strings and no shared string table.
+    header = "<row>" + "".join(_xlsx_cells(np.asarray(table.columns, dtype=object))) + "</row>"
+    sheets = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        sheet, rows = None, XLSX_MAX_ROWS
+        for chunk in table.chunks():
+            cells = [_xlsx_cells(np.asarray(chunk[c])) for c in table.columns]
+            lines = ["<row>" + "".join(row) + "</row>" for row in zip(*cells)]
+            while lines:
+                if rows == XLSX_MAX_ROWS:
+                    if sheet is not None:
+                        sheet.write(b"</sheetData></worksheet>")
+                        sheet.close()
+                    sheets += 1
+                    sheet = zf.open(f"xl/worksheets/sheet{sheets}.xml", "w", force_zip64=True)
+                    sheet.write(b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                                b'<sheetData>' + header.encode())
+                    rows = 1
+                take = lines[:XLSX_MAX_ROWS - rows]
+                sheet.write("".join(take).encode())
+                rows += len(take)
+                lines = lines[len(take):]
+        if sheet is None:
+            sheets = 1
+            zf.writestr("xl/worksheets/sheet1.xml",
+                        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        f"<sheetData>{header}</sheetData></worksheet>")
+        else:
+            sheet.write(b"</sheetData></worksheet>")
+            sheet.close()
+
+        names = [table.name[:31]] + [f"{table.name[:27]} ({i})" for i in range(2, sheets + 1)]
+        zf.writestr("[Content_Types].xml", _XLSX_PARTS["[Content_Types].xml"].format(sheets="".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, sheets + 1)
+        )))
+        zf.writestr("_rels/.rels", _XLSX_PARTS["_rels/.rels"])
+        zf.writestr("xl/styles.xml", _XLSX_PARTS["xl/styles.xml"])
+        zf.writestr("xl/workbook.xml", (
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name="{escape(n)}" sheetId="{i}" r:id="rId{i}"/>' for i, n in enumerate(names, 1))
+            + "</sheets></workbook>"
+        ))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+                for i in range(1, sheets + 1)
+            )
+            + f'<Relationship Id="rId{sheets + 1}" Target="styles.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+            "</Relationships>"
+        ))
+
+
+WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_xlsx}
+
+
+# --------------------------
+# Content-addressed export cache
+# --------------------------
+def _prune(out_dir, keep=MAX_FILES):
+    files = sorted(out_dir.glob("*-*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        path.unlink(missing_ok=True)
+
+
+@timed("export")
+def export_file(table, fmt, out_dir=EXPORT_DIR):
+    """Path of ``table`` written as ``fmt``; reuses the file of an identical earlier export."""
+    if fmt not in WRITERS:
+        raise ValueError(f"unsupported export format: {fmt}")
+    out_dir = Path(out_dir)
+    path = out_dir / f"{table.name}-{export_hash(table, fmt)}.{fmt}"
+    if path.exists():
+        os.utime(path)  # last use, for pruning
+        return path
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        WRITERS[fmt](tmp, table)
+        os.replace(tmp, path)  # concurrent identical exports end with the same file
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    _prune(out_dir)
+    return path
+
+
+def download_name(table, fmt):
+    return f"ecofly_{table.name}.{fmt}"
+
+
+def standard_tables(data, store, profile=None):
+    """The dashboard's exports: KPI tables, annual KPIs of ``store``, and the seasonal CO2 series."""
+    import ecofly_seasonal
+
+    tables = [store_table("kpi_tables", data.store, data.investments), store_table("annual_kpis", store)]
+    tables += [seasonal_table(store, resolution, profile) for resolution in ecofly_seasonal.RESOLUTIONS]
+    return {table.name: table for table in tables}
+
+
+if __name__ == "__main__":
+    import shutil
+    import time
+
+    from ecofly_datasource import default_source
+    from ecofly_simulation import simulate
+
+    parser = argparse.ArgumentParser(description="Export the KPIs and emission series at default assumptions.")
+    parser.add_argument("out", type=Path, help="directory to copy the exports to")
+    parser.add_argument("--format", choices=list(FORMATS), action="append", help="default: all formats")
+    parser.add_argument("--table", action="append", help="default: all tables")
+    args = parser.parse_args()
+
+    data = default_source().current()
+    tables = standard_tables(data, simulate(store=data.store, investments=data.investments))
+    args.out.mkdir(parents=True, exist_ok=True)
+    for name in args.table or tables:
+        for fmt in args.format or FORMATS:
+            start = time.perf_counter()
+            path = export_file(tables[name], fmt)
+            shutil.copyfile(path, args.out / download_name(tables[name], fmt))
+            print(f"{download_name(tables[name], fmt):<32} {path.stat().st_size / 1e6:8.2f} MB"
+                  f"  {(time.perf_counter() - start) * 1000:7.0f} ms")
@@ -0,0 +1,289 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from ecofly_format import format_numbers
+from ecofly_kpis import TECHNOLOGIES
+from ecofly_perf import timed
+from ecofly_sensitivity import pair_grid, tornado
+
+# --------------------------
+# Trend charts
+# --------------------------
+def _trend_figure(store, scenario, points, name):
+    years = store.years
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=years, y=store.take([scenario], years, ["CO2"]).ravel(), mode='lines', name=name))
+    fig.add_trace(go.Scatter(
+        x=points,
+        y=store.take([scenario], points, ["CO2"]).ravel(),
+        mode='markers',
+        marker=dict(size=10),
+        name="KPI Points"
+    ))
+    return fig
+
+
+@timed("figure.emissions_trend")
+def emissions_trend_figure(store, scenario, points):
+    """Yearly emissions curve with markers on the KPI table years in ``points``."""
+    fig = _trend_figure(store, scenario, points, "Emissions ton CO₂")
+    fig.update_layout(title="Projected Emissions (ton CO₂)", xaxis_title="Year", yaxis_title="Emissions")
+    return fig
+
+
+@timed("figure.hybrid_trend")
+def hybrid_trend_figure(store, scenario, points):
+    fig = _trend_figure(store, scenario, points, "Hybrid Emissions")
+    fig.update_layout(title="Projected CO₂ Emissions", xaxis_title="Year", yaxis_title="ton CO₂")
+    return fig
+
+
+# --------------------------
+# Scenario comparison
+# --------------------------
+COMPARISON_METRICS = ("Revenue", "Profit", "Cashflow", "Waste", "CO2", "TRL")
+
+
+@timed("dataframe.comparison_table")
+def comparison_table(store, year, scenarios, investments=None):
+    """Numeric KPI table, one row per scenario; formatting is left to the display."""
+    scenarios = list(scenarios)
+    df = pd.DataFrame(store.take(scenarios, [year], COMPARISON_METRICS)[:, 0], columns=COMPARISON_METRICS)
+    df.insert(0, "Scenario", scenarios)
+    if investments is not None:
+        df["Investment"] = np.array([investments.get(s, np.nan) for s in scenarios], dtype=float)
+    return df
+
+
+@timed("dataframe.query_comparison")
+def query_comparison(df, sort_by="CO2", ascending=True, search="", min_trl=None):
+    """Filter and sort the comparison table; rows without a value sort last."""
+    mask = np.ones(len(df), dtype=bool)
+    if search:
+        mask &= df["Scenario"].str.contains(search, case=False, regex=False).to_numpy()
+    if min_trl is not None and min_trl > 1:  # TRL 1 is the scale's floor: no filter, keep rows without a TRL
+        mask &= df["TRL"].to_numpy() >= min_trl
+    return df[mask].sort_values(sort_by, ascending=ascending, na_position="last", kind="stable")
+
+
+@timed("figure.comparison_bar")
+def comparison_bar_figure(df, year, top_n=25):
+    """Emissions bars for the first ``top_n`` rows of an already sorted table."""
+    shown = df.head(top_n)
+    labels, missing = format_numbers(shown["CO2"], " CO₂")
+    title = f"{year} Emissions by Scenario"
+    if len(df) > top_n:
+        title += f" (first {top_n} of {len(df)})"
+    fig = px.bar(shown, x="CO2", y="Scenario", orientation='h', text=labels.where(~missing, ""), title=title)
+    fig.update_layout(xaxis_title="Emissions CO₂", yaxis=dict(autorange="reversed"))
+    return fig
+
+
+# --------------------------
+# Uncertainty bands
+# --------------------------
+@timed("figure.uncertainty_bands")
+def add_uncertainty_bands(fig, years, bands, name, color="99,110,250"):
+    p5, p50, p95 = bands
+    fig.add_trace(go.Scatter(x=years, y=p95, mode='lines', line=dict(width=0), showlegend=False, hoverinfo="skip"))
+    fig.add_trace(go.Scatter(
+        x=years, y=p5, mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor=f"rgba({color},0.2)", name=f"{name} P5–P95"
+    ))
+    fig.add_trace(go.Scatter(x=years, y=p50, mode='lines', line=dict(dash='dash', color=f"rgb({color})"), name=f"{name} P50"))
+    return fig
+
+
+def cashflow_band_figure(years, bands):
+    fig = go.Figure()
+    add_uncertainty_bands(fig, years, bands, "Cashflow", color="0,160,100")
+    fig.update_layout(title="Projected Cashflow (€)", xaxis_title="Year", yaxis_title="Cashflow")
+    return fig
+
+
+# --------------------------
+# Seasonal emissions
+# --------------------------
+@timed("figure.seasonal")
+def seasonal_figure(series, resolution, window=None):
+    """WebGL lines for {scenario: (dates, values)}, already cut to the visible window."""
+    fig = go.Figure()
+    for name, (t, values) in series.items():
+        fig.add_trace(go.Scattergl(x=t, y=values, mode="lines", name=name))
+    per = {"monthly": "month", "weekly": "week", "daily": "day"}[resolution]
+    fig.update_layout(
+        title=f"Seasonal Emissions (ton CO₂ per {per})", xaxis_title="Date", yaxis_title="Emissions",
+        hovermode="x unified",
+    )
+    if window is not None:
+        fig.update_xaxes(range=[str(w) for w in window])
+    return fig
+
+
+# --------------------------
+# Technology portfolios
+# --------------------------
+@timed("figure.pareto")
+def pareto_figure(front, references=None):
+    """Pareto-optimal portfolios, with the modelled scenarios as reference points."""
+    from ecofly_optimizer import portfolio_label
+
+    fig = go.Figure(go.Scatter(
+        x=front.co2, y=front.cashflow, mode="lines+markers", name="Optimal portfolios",
+        text=[portfolio_label(s) for s in front.shares],
+        hovertemplate="%{text}<br>%{x:,.0f} ton CO₂<br>€%{y:,.0f}<extra></extra>",
+    ))
+    for name, (co2, cashflow) in (references or {}).items():
+        fig.add_trace(go.Scatter(x=[co2], y=[cashflow], mode="markers", marker=dict(symbol="diamond", size=11), name=name))
+    fig.update_layout(
+        title="Cumulative Emissions vs Cumulative Cashflow",
+        xaxis_title="Cumulative emissions (ton CO₂)", yaxis_title="Cumulative cashflow (€)",
+    )
+    return fig
+
+
+@timed("dataframe.portfolio_table")
+def portfolio_table(front):
+    """One row per optimal portfolio: shares per technology and decade plus its totals."""
+    from ecofly_optimizer import DECADES
+
+    shares = front.shares.reshape(len(front.shares), -1)
+    df = pd.DataFrame(np.round(shares * 100, 1), columns=[f"{t} {d}" for t in TECHNOLOGIES for d in DECADES])
+    df = df.loc[:, (df != 0).any()]
+    df["CO2"] = front.co2
+    df["Cashflow"] = front.cashflow
+    df["Investment"] = front.investment
+    df["TRL"] = front.trl
+    return df
+
+
+# --------------------------
+# Investment returns
+# --------------------------
+@timed("dataframe.returns_table")
+def returns_table(result, rate=0, inflation=0):
+    """Investment, NPV, IRR and payback per scenario at one point of the sweep."""
+    return pd.DataFrame({
+        "Scenario": result.scenarios,
+        "Investment": result.investment,
+        "NPV": result.npv[rate, inflation],
+        "IRR": result.irr[inflation] * 100,
+        "Payback": result.payback[rate, inflation],
+    })
+
+
+@timed("figure.cumulative_cashflow")
+def cumulative_cashflow_figure(result, rate=0, inflation=0):
+    fig = go.Figure()
+    for s, name in enumerate(result.scenarios):
+        fig.add_trace(go.Scatter(x=result.years, y=result.cumulative[rate, inflation, s], mode="lines", name=name))
+    fig.add_hline(y=0, line=dict(color="gray", dash="dot"))
+    fig.update_layout(
+        title=f"Cumulative Discounted Cashflow at {result.rates[rate]:.1%} (€)",
+        xaxis_title="Year", yaxis_title="Discounted cashflow since 2025",
+    )
+    return fig
+
+
+@timed("figure.npv_heatmap")
+def npv_heatmap_figure(result, scenario):
+    """NPV of one scenario over the discount rate × inflation sweep."""
+    npv = result.npv[:, :, result.scenarios.index(scenario)]
+    fig = go.Figure(go.Heatmap(
+        x=result.rates * 100, y=result.inflations * 100, z=npv.T, colorscale="RdYlGn", zmid=0,
+        hovertemplate="Discount %{x:.2f}%<br>Inflation %{y:.2f}%<br>NPV €%{z:,.0f}<extra></extra>",
+    ))
+    fig.update_layout(title=f"NPV of {scenario} (€)", xaxis_title="Discount rate (%)", yaxis_title="Inflation (%)")
+    return fig
+
+
+# --------------------------
+# Bottom-up flight emissions
+# --------------------------
+@timed("figure.flight_breakdown")
+def flight_breakdown_figure(result, scenario, year):
+    """CO₂ per route, stacked by aircraft type, for one scenario/year."""
+    cube = result.totals[2, result.scenarios.index(scenario), result.years.index(year)]
+    df = pd.DataFrame(cube, index=result.routes, columns=result.aircraft)
+    df = df.loc[df.sum(axis=1) > 0, (df > 0).any()]
+    df = df.loc[df.sum(axis=1).sort_values(ascending=False).index]
+    fig = go.Figure([go.Bar(y=df.index, x=df[a], name=a, orientation="h") for a in df.columns])
+    fig.update_layout(
+        barmode="stack", title=f"{year} Flight Emissions by Route (ton CO₂, before calibration)",
+        xaxis_title="Emissions CO₂", yaxis=dict(autorange="reversed"), height=700,
+    )
+    return fig
+
+
+def flight_gap_table(flights, store, year):
+    """Calibrated bottom-up CO₂ next to the KPI model's, per scenario, for one year."""
+    scenarios = [s for s in flights.scenarios if s in store.scenario_index]
+    bottom_up = flights.take(scenarios, [year], ["CO2"]).ravel()
+    kpi = store.take(scenarios, [year], ["CO2"]).ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gap = np.where(kpi > 0, (bottom_up - kpi) / kpi * 100, np.nan)
+    return pd.DataFrame({"Scenario": scenarios, "Bottom-up": bottom_up, "KPI model": kpi, "Gap": gap})
+
+
+# --------------------------
+# Sensitivity
+# --------------------------
+def tornado_figure(result, scenario, year, metric):
+    """Change in one KPI when each input moves to its low / high value."""
+    labels, low, high = tornado(result, scenario, year, metric)
+    fig = go.Figure([
+        go.Bar(y=labels, x=low, name="Low", orientation="h", marker_color="#636efa"),
+        go.Bar(y=labels, x=high, name="High", orientation="h", marker_color="#ef553b"),
+    ])
+    fig.update_layout(
+        barmode="overlay", title=f"{year} {metric} Sensitivity of {scenario}",
+        xaxis_title=f"Change in {metric}", yaxis=dict(autorange="reversed"),
+    )
+    return fig
+
+
+def sensitivity_heatmap_figure(result, first, second, scenario, year, metric):
+    """One KPI over the grid of two inputs."""
+    x, y, z = pair_grid(result, first, second, scenario, year, metric)
+    labels = dict(zip(result.factors, result.labels))
+    fig = go.Figure(go.Heatmap(
+        x=x, y=y, z=z.T, colorscale="RdYlGn_r" if metric in ("CO2", "Waste") else "RdYlGn",
+        hovertemplate="%{x:,.3g} × %{y:,.3g}<br>" + metric + " %{z:,.0f}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=f"{year} {metric} of {scenario}",
+        xaxis_title=labels[first].split(" ±")[0], yaxis_title=labels[second].split(" ±")[0],
+    )
+    return fig
+
+
+# --------------------------
+# Scenario ranking
+# --------------------------
+@timed("dataframe.ranking_table")
+def ranking_table(result, year, top_n=None):
+    """Scenarios in rank order for one year, with their score."""
+    y = result.years.index(year)
+    order = np.argsort(result.ranks[:, y], kind="stable")[:top_n]
+    return pd.DataFrame({
+        "Rank": result.ranks[order, y],
+        "Scenario": np.asarray(result.scenarios, dtype=object)[order],
+        "Score": result.scores[order, y],
+    })
+
+
+@timed("figure.rank_trend")
+def rank_trend_figure(result, scenarios):
+    """Rank of each given scenario over the years (1 at the top)."""
+    fig = go.Figure([
+        go.Scatter(x=result.years, y=result.ranks[result.scenarios.index(s)], mode="lines+markers", name=s,
+                   line_shape="hv")
+        for s in scenarios
+    ])
+    fig.update_layout(
+        title=f"Rank over Time ({result.method}, {result.normalization} normalization)",
+        xaxis_title="Year", yaxis=dict(title="Rank", autorange="reversed", rangemode="tozero"),
+    )
+    return fig
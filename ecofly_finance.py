@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+import numpy as np
+
+from ecofly_assumptions import DEFAULT_ASSUMPTIONS
+from ecofly_kpis import hold_ends
+from ecofly_perf import timed
+from ecofly_simulation import BASE_YEAR, investment_schedule
+
+# --------------------------
+# Discounted cashflow engine
+# --------------------------
+# A scenario's net cash flow per year is its profit minus the investments
+# paid out that year (ecofly_simulation.investment_schedule: the phased
+# plans, or the up-front investment figure in BASE_YEAR), discounted to
+# BASE_YEAR. Years before a scenario's first KPI year (or after its last)
+# have no profit figure; they are assumed to earn the nearest known year's
+# profit, so investments paid out in BASE_YEAR are set against a full
+# horizon.
+#
+# Sweeps run over a grid of discount rates × inflation rates in one go:
+# inflation re-indexes the profit path relative to the inflation the
+# store was simulated with (revenue and operating cost both follow the
+# price level, so profit does too), while investments are fixed nominal
+# commitments. With R rates, I inflation rates, S scenarios and T years,
+# the whole sweep is a single (R, I, T) × (I, S, T) contraction.
+IRR_GRID = np.r_[np.linspace(-0.9, 1.0, 96), np.geomspace(1.1, 20.0, 30)]
+IRR_STEPS = 50  # bisection steps after bracketing, ~1e-15 of the bracket
+
+Financials = namedtuple(
+    "Financials", "scenarios years rates inflations investment cashflow cumulative npv irr payback"
+)
+
+
+def investment_outlays(scenarios, years, investments=None):
+    """Investment paid out (€) per scenario/year; ``investments`` as in investment_schedule."""
+    years = np.asarray(years)
+    out = np.zeros((len(scenarios), len(years)))
+    for s, scenario in enumerate(scenarios):
+        for year, amount in investment_schedule(scenario, investments).items():
+            out[s, years == year] += amount
+    return out
+
+
+def net_cashflows(store, inflations=None, base_inflation=DEFAULT_ASSUMPTIONS.inflation, investments=None):
+    """Nominal net cash flow of shape (inflation, scenario, year).
+
+    ``store`` is annual (e.g. from ecofly_simulation.simulate) and was
+    simulated with ``base_inflation``.
+    """
+    inflations = np.atleast_1d(np.asarray(base_inflation if inflations is None else inflations, dtype=float))
+    t = np.asarray(store.years) - BASE_YEAR
+    index = ((1 + inflations[:, None]) / (1 + base_inflation)) ** t
+    profit = np.nan_to_num(hold_ends(store.metric("Profit")))
+    return index[:, None, :] * profit - investment_outlays(store.scenarios, store.years, investments)
+
+
+def _npv_at(flows, t, rates):
+    # flows (..., T), rates broadcastable to flows.shape[:-1]
+    return (flows * (1 + rates[..., None]) ** -t).sum(axis=-1)
+
+
+def internal_rates(flows, t):
+    """IRR per row of ``flows`` (..., T); NaN when there is none.
+
+    The IRR is the lowest rate at which NPV turns from positive to
+    negative; streams whose NPV only rises with the rate (income first,
+    costs later) have none. Rows are bracketed on IRR_GRID and then
+    bisected together.
+    """
+    curve = flows @ ((1 + IRR_GRID[:, None]) ** -t).T
+    sign = np.signbit(curve)
+    change = ~sign[..., :-1] & sign[..., 1:]
+    found = change.any(axis=-1)
+    k = change.argmax(axis=-1)
+    lo, hi = IRR_GRID[k], IRR_GRID[k + 1]
+    f_lo = np.take_along_axis(curve, k[..., None], axis=-1)[..., 0]
+    for _ in range(IRR_STEPS):
+        mid = (lo + hi) / 2
+        f_mid = _npv_at(flows, t, mid)
+        left = np.signbit(f_mid) != np.signbit(f_lo)
+        hi = np.where(left, mid, hi)
+        lo = np.where(left, lo, mid)
+        f_lo = np.where(left, f_lo, f_mid)
+    return np.where(found, (lo + hi) / 2, np.nan)
+
+
+def payback_years(cumulative, years):
+    """First year from which the cumulative cash flow stays non-negative; NaN if never."""
+    stays = np.minimum.accumulate(cumulative[..., ::-1], axis=-1)[..., ::-1] >= 0
+    first = stays.argmax(axis=-1)
+    return np.where(stays.any(axis=-1), np.asarray(years, dtype=float)[first], np.nan)
+
+
+@timed("financials")
+def financials(store, rates=None, inflations=None, base_inflation=DEFAULT_ASSUMPTIONS.inflation, investments=None):
+    """NPV, IRR, payback and discounted cumulative cash flow for every scenario.
+
+    Shapes: investment (S,) in total, cashflow (I, S, T), cumulative
+    (R, I, S, T), npv and payback (R, I, S), irr (I, S); R and I are the
+    lengths of ``rates`` and ``inflations`` (defaulting to the default
+    cost of capital and ``base_inflation``). ``investments`` are the
+    up-front figures (€ million) of KpiData.investments.
+    """
+    rates = np.atleast_1d(np.asarray(DEFAULT_ASSUMPTIONS.cost_of_capital if rates is None else rates, dtype=float))
+    inflations = np.atleast_1d(np.asarray(base_inflation if inflations is None else inflations, dtype=float))
+    t = np.asarray(store.years) - BASE_YEAR
+    flows = net_cashflows(store, inflations, base_inflation, investments)
+    discount = (1 + rates[:, None]) ** -t
+    cumulative = np.cumsum(discount[:, None, None, :] * flows[None], axis=-1)
+    return Financials(
+        store.scenarios, store.years, rates, inflations,
+        investment_outlays(store.scenarios, store.years, investments).sum(axis=1), flows, cumulative,
+        cumulative[..., -1], internal_rates(flows, t), payback_years(cumulative, store.years),
+    )
+
+
+if __name__ == "__main__":
+    import time
+
+    from ecofly_simulation import simulate
+
+    store = simulate()
+    result = financials(store)
+    for s, scenario in enumerate(store.scenarios):
+        payback = result.payback[0, 0, s]
+        print(f"{scenario:<36} NPV €{result.npv[0, 0, s] / 1e9:7.2f} B  IRR {result.irr[0, s]:8.1%}  "
+              f"payback {'never' if np.isnan(payback) else int(payback)}")
+    for n in (20, 50):
+        start = time.perf_counter()
+        financials(store, np.linspace(0, 0.15, n), np.linspace(0, 0.06, n))
+        print(f"{n}×{n} rate/inflation sweep: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,341 @@
+import argparse
+import logging
+import os
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from ecofly_kpis import BASELINE, annual_grid, hold_ends, kpi_store
+from ecofly_perf import timed
+from ecofly_simulation import HORIZON, SAF_REDUCTION, technology_schedule, worker_pool
+
+log = logging.getLogger(__name__)
+
+# --------------------------
+# Bottom-up flight emissions
+# --------------------------
+# A flight schedule has one row per flight: scenario, year, route, distance,
+# aircraft, fuel type, SAF blend and load factor. Every chunk of rows goes
+# through one vectorized kernel (fuel burn → CO2) and is reduced with
+# bincount into a small (measure, scenario, year, route, aircraft) cube,
+# so memory stays bounded by the chunk size however long the schedule is.
+# Chunks run on the worker pool when there is more than one.
+#
+# The synthetic schedule follows the scenario texts: about 28,718 flights a
+# year to 28 destinations. Long-haul flights use the A350. On short-haul,
+# each flight draws where it lands in the scenario's technology shares:
+# trains replace it, an electric or hydrogen type flies it when one with the
+# range is in service that year, or the 737 flies it. SAF is a blend on
+# every kerosene flight.
+KEROSENE, HYDROGEN, ELECTRIC = 0, 1, 2
+FUELS = ("Kerosene", "Hydrogen", "Electric")
+CO2_PER_KG = np.array([3.16, 0.0, 0.0])  # kg CO2 per kg of fuel burnt (kerosene-equivalent energy)
+LOAD_SENSITIVITY = 0.2    # share of trip fuel that scales with payload
+LOAD_FACTOR = (0.85, 0.08)  # mean and spread of the load factor per flight, clipped to 30–100%
+BASE_FLIGHTS = 28_718
+CHUNK_ROWS = 500_000
+
+# name: (fuel, kg fuel per km at full load, kg per landing/take-off cycle, range km, in service from)
+AIRCRAFT = {
+    "A350-900": (KEROSENE, 6.4, 2300, 15_000, 2025),
+    "737-800": (KEROSENE, 2.9, 850, 5_400, 2025),
+    "Dash 8-H2": (HYDROGEN, 1.0, 250, 1_000, 2030),
+    "ZEROe Turboprop": (HYDROGEN, 1.7, 400, 1_850, 2040),
+    "ZEROe Jet": (HYDROGEN, 3.0, 900, 3_700, 2040),
+    "Electric 90": (ELECTRIC, 1.2, 200, 800, 2040),
+    "Electric 150": (ELECTRIC, 1.8, 300, 1_500, 2050),
+}
+# name: (great-circle km from Lelystad, weekly departures, long-haul)
+ROUTES = {
+    "London": (360, 28, False), "Paris": (400, 28, False), "Berlin": (580, 21, False),
+    "Copenhagen": (620, 21, False), "Munich": (670, 21, False), "Milan": (830, 21, False),
+    "Vienna": (940, 14, False), "Nice": (1000, 21, False), "Split": (1200, 14, False),
+    "Barcelona": (1240, 28, False), "Rome": (1300, 28, False), "Palma": (1330, 35, False),
+    "Dubrovnik": (1430, 14, False), "Ibiza": (1450, 21, False), "Alicante": (1480, 21, False),
+    "Naples": (1500, 14, False), "Málaga": (1830, 28, False), "Faro": (1850, 21, False),
+    "Lisbon": (1860, 21, False), "Heraklion": (2500, 21, False), "Antalya": (2550, 28, False),
+    "Tenerife": (3050, 21, False), "Punta Cana": (7400, 7, True), "Paramaribo": (7460, 10, True),
+    "Aruba": (7800, 7, True), "Curaçao": (7860, 10, True), "Bonaire": (7870, 7, True),
+    "Cancún": (8280, 7, True),
+}
+MEASURES = ("Flights", "Fuel", "CO2")
+
+_fuel, _burn, _lto, _range, _since = (np.array(column) for column in zip(*AIRCRAFT.values()))
+_km, _weekly, _long_haul = (np.array(column) for column in zip(*ROUTES.values()))
+A350, B737 = list(AIRCRAFT).index("A350-900"), list(AIRCRAFT).index("737-800")
+
+FlightEmissions = namedtuple("FlightEmissions", "scenarios years routes aircraft totals")
+
+
+def route_flights(flights=BASE_FLIGHTS):
+    """Yearly departures per route, in proportion to the weekly timetable, summing to ``flights``."""
+    exact = _weekly * flights / _weekly.sum()
+    out = np.floor(exact).astype(int)
+    out[np.argsort(out - exact)[:flights - out.sum()]] += 1
+    return out
+
+
+def flight_emissions(schedule):
+    """(fuel, CO2) in kg per row of a schedule chunk."""
+    aircraft = schedule["aircraft"]
+    payload = 1 - LOAD_SENSITIVITY * (1 - schedule["load_factor"])
+    fuel = _burn[aircraft] * schedule["distance_km"] * payload + _lto[aircraft]
+    return fuel, fuel * CO2_PER_KG[schedule["fuel"]] * (1 - SAF_REDUCTION * schedule["saf_blend"])
+
+
+def aggregate_chunk(schedule, n_scenarios, years):
+    """(measure, scenario, year, route, aircraft) totals of one chunk; fuel and CO2 in kg."""
+    fuel, co2 = flight_emissions(schedule)
+    shape = (n_scenarios, len(years), len(ROUTES), len(AIRCRAFT))
+    y = np.searchsorted(years, schedule["year"])
+    unknown = (y == len(years)) | (years[np.minimum(y, len(years) - 1)] != schedule["year"])
+    if unknown.any():
+        raise ValueError(f"schedule year(s) not in the horizon: {sorted(set(schedule['year'][unknown].tolist()))}")
+    cell = np.ravel_multi_index(
+        (schedule["scenario"], y, schedule["route"], schedule["aircraft"]),
+        shape,
+    )
+    size = int(np.prod(shape))
+    return np.stack([
+        np.bincount(cell, minlength=size), np.bincount(cell, fuel, size), np.bincount(cell, co2, size),
+    ]).reshape(len(MEASURES), *shape)
+
+
+# --------------------------
+# Synthetic schedule
+# --------------------------
+def scenario_shares(scenarios, years):
+    """{technology: (scenario, year) adoption share} for the schedule draws."""
+    return {tech: technology_schedule(tech, scenarios, years) for tech in ("Train", "Electric", "H2", "SAF")}
+
+
+def _pick(types, distance, year):
+    # Smallest in-service type of the given ones that covers each distance; -1 when none does.
+    types = np.asarray(types)
+    usable = (_since[types] <= year)[None] & (_range[types][None] >= distance[:, None])
+    return np.where(usable.any(axis=1), types[usable.argmax(axis=1)], -1)
+
+
+def schedule_block(s, y, year, shares, flights, seed=0):
+    """Every flight of scenario index ``s`` in ``year`` (column ``y`` of ``shares``)."""
+    rng = np.random.default_rng([seed, s, year])
+    route = np.repeat(np.arange(len(ROUTES)), flights).astype(np.int16)
+    n = len(route)
+    distance = _km[route].astype(float)
+    draw = rng.random(n, dtype=np.float32)
+    aircraft = np.where(_long_haul[route], A350, B737)
+
+    train, electric, h2 = shares["Train"][s, y], shares["Electric"][s, y], shares["H2"][s, y]
+    short = ~_long_haul[route]
+    by_train = short & (draw < train)
+    for lo, hi, types in (
+        (train, train + electric, [i for i, a in enumerate(_fuel) if a == ELECTRIC]),
+        (train + electric, train + electric + h2, [i for i, a in enumerate(_fuel) if a == HYDROGEN]),
+    ):
+        chosen = short & (draw >= lo) & (draw < hi)
+        picked = _pick(types, distance[chosen], year)
+        aircraft[np.flatnonzero(chosen)[picked >= 0]] = picked[picked >= 0]
+
+    keep = ~by_train
+    aircraft = aircraft[keep].astype(np.int8)
+    fuel = _fuel[aircraft].astype(np.int8)
+    return {
+        "scenario": np.full(len(aircraft), s, dtype=np.int16),
+        "year": np.full(len(aircraft), year, dtype=np.int16),
+        "route": route[keep],
+        "distance_km": distance[keep],
+        "aircraft": aircraft,
+        "fuel": fuel,
+        "saf_blend": np.where(fuel == KEROSENE, shares["SAF"][s, y], 0.0),
+        "load_factor": np.clip(rng.normal(*LOAD_FACTOR, n), 0.3, 1.0)[keep],
+    }
+
+
+def _concat(blocks):
+    return {key: np.concatenate([b[key] for b in blocks]) for key in blocks[0]}
+
+
+def _synthetic_chunk(cells, years, shares, flights, seed, n_scenarios):
+    schedule = _concat([schedule_block(s, y, years[y], shares, flights, seed) for s, y in cells])
+    return aggregate_chunk(schedule, n_scenarios, years)
+
+
+def synthetic_schedule(scenarios, years=HORIZON, flights=BASE_FLIGHTS, seed=0, chunk_rows=CHUNK_ROWS):
+    """The synthetic schedule as a stream of chunks of about ``chunk_rows`` rows.
+
+    A chunk always holds whole scenario-years, so it can exceed
+    ``chunk_rows`` when a single year has more flights than that.
+    """
+    years = np.asarray(years)
+    shares = scenario_shares(scenarios, years)
+    per_route = route_flights(flights)
+    for cells in _cell_batches(len(scenarios), len(years), per_route.sum(), chunk_rows):
+        yield _concat([schedule_block(s, y, years[y], shares, per_route, seed) for s, y in cells])
+
+
+def _cell_batches(n_scenarios, n_years, rows_per_cell, chunk_rows):
+    cells = [(s, y) for s in range(n_scenarios) for y in range(n_years)]
+    per_chunk = max(1, chunk_rows // max(1, rows_per_cell))
+    return [cells[i:i + per_chunk] for i in range(0, len(cells), per_chunk)]
+
+
+# --------------------------
+# Streaming aggregation
+# --------------------------
+def _bounded_map(func, args, parallel, window):
+    # At most ``window`` chunks are in flight, so a long schedule is never
+    # read into memory as a whole ahead of the workers.
+    args = iter(args)
+    if not parallel:
+        for a in args:
+            yield func(*a)
+        return
+    pool = worker_pool()
+    pending = [pool.submit(func, *a) for a in islice(args, window)]
+    while pending:
+        result = pending.pop(0).result()
+        pending.extend(pool.submit(func, *a) for a in islice(args, 1))
+        yield result
+
+
+def _finish(scenarios, years, parts):
+    totals = None
+    for part in parts:
+        totals = part if totals is None else totals + part
+    if totals is None:
+        totals = np.zeros((len(MEASURES), len(scenarios), len(years), len(ROUTES), len(AIRCRAFT)))
+    totals[1:] /= 1000  # kg → ton
+    return FlightEmissions(list(scenarios), [int(y) for y in years], list(ROUTES), list(AIRCRAFT), totals)
+
+
+@timed("flight_emissions")
+def simulate_flights(scenarios=None, years=HORIZON, flights=BASE_FLIGHTS, seed=0, chunk_rows=CHUNK_ROWS, parallel=None):
+    """Bottom-up totals for the synthetic schedule of every scenario and year.
+
+    Each worker builds its own chunk of the schedule and keeps only its
+    small per-chunk totals, so the schedule is never held as a whole.
+    """
+    scenarios = list(kpi_store.scenarios if scenarios is None else scenarios)
+    years = np.asarray(years)
+    shares = scenario_shares(scenarios, years)
+    per_route = route_flights(flights)
+    batches = _cell_batches(len(scenarios), len(years), per_route.sum(), chunk_rows)
+    if parallel is None:
+        parallel = len(batches) > 1
+    args = ((cells, years, shares, per_route, seed, len(scenarios)) for cells in batches)
+    return _finish(scenarios, years, _bounded_map(_synthetic_chunk, args, parallel, 2 * (os.cpu_count() or 1)))
+
+
+def read_schedule(path, scenarios, chunk_rows=CHUNK_ROWS, years=HORIZON):
+    """Stream a schedule CSV (names, not codes) as chunks of ``chunk_rows`` rows.
+
+    Columns: scenario, year, route, distance_km, aircraft, fuel, saf_blend,
+    load_factor, as written by write_schedule. Rows for years outside
+    ``years`` are dropped, and the number dropped is logged.
+    """
+    import pandas as pd
+
+    codes = {"scenario": list(scenarios), "route": list(ROUTES), "aircraft": list(AIRCRAFT), "fuel": list(FUELS)}
+    dropped = 0
+    for df in pd.read_csv(path, chunksize=chunk_rows):
+        outside = ~df["year"].isin(years)
+        if outside.any():
+            dropped += int(outside.sum())
+            df = df[~outside]
+        chunk = {name: df[name].to_numpy() for name in ("year", "distance_km", "saf_blend", "load_factor")}
+        for name, labels in codes.items():
+            chunk[name] = pd.Categorical(df[name], categories=labels).codes
+            if (chunk[name] < 0).any():
+                raise ValueError(f"{path}: unknown {name} {df[name][chunk[name] < 0].iloc[0]!r}")
+        yield chunk
+    if dropped:
+        log.warning("%s: dropped %d row(s) outside %d–%d", path, dropped, min(years), max(years))
+
+
+@timed("flight_emissions")
+def aggregate_schedule(chunks, scenarios, years=HORIZON, parallel=False):
+    """Bottom-up totals for any stream of schedule chunks (e.g. read_schedule)."""
+    years = np.asarray(years)
+    args = ((chunk, len(scenarios), years) for chunk in chunks)
+    return _finish(scenarios, years, _bounded_map(aggregate_chunk, args, parallel, 2 * (os.cpu_count() or 1)))
+
+
+def write_schedule(path, scenarios=None, years=HORIZON, flights=BASE_FLIGHTS, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write the synthetic schedule as CSV, one chunk at a time; returns the row count."""
+    import pandas as pd
+
+    scenarios = list(kpi_store.scenarios if scenarios is None else scenarios)
+    names = {"scenario": scenarios, "route": list(ROUTES), "aircraft": list(AIRCRAFT), "fuel": list(FUELS)}
+    rows = 0
+    for i, chunk in enumerate(synthetic_schedule(scenarios, years, flights, seed, chunk_rows)):
+        df = pd.DataFrame({k: np.asarray(names[k])[v] if k in names else v for k, v in chunk.items()})
+        df.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(df)
+    return rows
+
+
+# --------------------------
+# Into the KPI cube
+# --------------------------
+def calibration(result, reference=kpi_store):
+    """Per-year factor that makes the bottom-up baseline match the reference CO2 path.
+
+    It absorbs what the schedule does not model (ground operations, growth
+    between table years). Years outside the reference's known range take
+    the factor of the nearest known year; 1 where the reference has no
+    baseline.
+    """
+    if BASELINE not in result.scenarios or BASELINE not in reference.scenario_index:
+        return np.ones(len(result.years))
+    table = annual_grid(reference, tuple(result.years)).take([BASELINE], None, ["CO2"]).ravel()
+    modelled = result.totals[2, result.scenarios.index(BASELINE)].sum(axis=(1, 2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        factor = table / modelled
+    factor = hold_ends(np.where(np.isfinite(factor), factor, np.nan))
+    return np.where(np.isnan(factor), 1.0, factor)
+
+
+def flight_store(result, factor=None):
+    """KpiStore of per-scenario/year Flights, Fuel (ton) and CO2 (ton), CO2 scaled by ``factor``."""
+    from ecofly_kpis import KpiStore
+
+    values = result.totals.sum(axis=(3, 4)).transpose(1, 2, 0)
+    if factor is not None:
+        values[..., MEASURES.index("CO2")] *= factor
+    return KpiStore(result.scenarios, result.years, MEASURES, values)
+
+
+def breakdown(result, scenario, year, by="route", measure="CO2"):
+    """{route or aircraft: total} for one scenario/year, largest first, zeros dropped."""
+    cube = result.totals[MEASURES.index(measure), result.scenarios.index(scenario), result.years.index(year)]
+    values, labels = (cube.sum(axis=1), result.routes) if by == "route" else (cube.sum(axis=0), result.aircraft)
+    order = np.argsort(-values)
+    return {labels[i]: float(values[i]) for i in order if values[i]}
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Bottom-up flight emissions for the synthetic schedule.")
+    parser.add_argument("--flights", type=int, default=BASE_FLIGHTS, help="flights per scenario and year")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--serial", action="store_true", help="do not use the worker pool")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = simulate_flights(flights=args.flights, chunk_rows=args.chunk_rows, parallel=False if args.serial else None)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    rows = int(result.totals[0].sum())
+    print(f"{rows:,} flights in {elapsed:.2f}s ({rows / elapsed / 1e6:.1f} M rows/s), peak {peak / 2**20:.0f} MiB")
+
+    factor = calibration(result)
+    store = flight_store(result, factor)
+    print(f"calibration factor {factor.min():.3f}–{factor.max():.3f}")
+    for scenario in store.scenarios:
+        bottom_up = [store.value(scenario, y, "CO2") for y in (2030, 2040, 2050)]
+        table = [kpi_store.value(scenario, y, "CO2") for y in (2030, 2040, 2050)]
+        print(f"{scenario:<36} " + "  ".join(f"{b:>9,.0f} ({t:>9,.0f})" for b, t in zip(bottom_up, table)))
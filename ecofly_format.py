@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from ecofly_perf import timed
+
+# --------------------------
+# Number formatting helper
+# --------------------------
+@timed("format_number")
+def format_number(n, unit=""):
+    if isinstance(n, str):  # bijvoorbeeld "-"
+        return n
+
+    try:
+        abs_n = abs(n)
+        if abs_n >= 1e9:
+            return f"{n / 1e9:.1f} B{unit}"  # miljard
+        elif abs_n >= 1e6:
+            return f"{n / 1e6:.1f} M{unit}"  # miljoen
+        elif abs_n >= 1e3:
+            return f"{n / 1e3:.0f} K{unit}"  # duizend
+        elif abs_n == int(abs_n):
+            return f"{int(n)}{unit}"
+        else:
+            return f"{n:.2f}{unit}"
+    except:
+        return str(n)  # fallback als n niet numeriek is
+
+
+# --------------------------
+# Batch formatting for tables
+# --------------------------
+# Same buckets as format_number: (threshold, scale, printf format, suffix).
+_BUCKETS = (
+    (1e9, 1e9, "%.1f", " B"),
+    (1e6, 1e6, "%.1f", " M"),
+    (1e3, 1e3, "%.0f", " K"),
+)
+
+
+@timed("format_numbers")
+def format_numbers(values, unit="", prefix=""):
+    """Vectorized format_number for an array or Series.
+
+    Returns ``(labels, missing)``; missing/non-numeric cells are flagged in
+    the boolean mask and left as empty labels, so the caller decides how to
+    show them. A Series input gives Series outputs on the same index.
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    v = pd.to_numeric(pd.Series(np.ravel(values)), errors="coerce").to_numpy(dtype=float)
+    missing = np.isnan(v)
+    abs_v = np.abs(v)
+
+    conditions = [abs_v >= threshold for threshold, _, _, _ in _BUCKETS]
+    conditions.append(abs_v == np.trunc(abs_v))
+    bucket = np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+    bucket[missing] = -1
+
+    labels = np.full(v.shape, "", dtype=object)
+    formats = [(scale, fmt, suffix) for _, scale, fmt, suffix in _BUCKETS]
+    formats += [(1, "%d", ""), (1, "%.2f", "")]
+    for i, (scale, fmt, suffix) in enumerate(formats):
+        sel = bucket == i
+        if sel.any():
+            text = np.char.mod(fmt, v[sel] / scale)
+            labels[sel] = np.char.add(np.char.add(prefix, text), suffix + unit)
+
+    labels = labels.reshape(np.shape(values))
+    missing = missing.reshape(np.shape(values))
+    if index is not None:
+        return pd.Series(labels, index=index), pd.Series(missing, index=index)
+    return labels, missing
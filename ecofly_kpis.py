@@ -0,0 +1,407 @@
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+from ecofly_assumptions import INTERPOLATION_METHODS
+from ecofly_perf import timed
+
+# --------------------------
+# Scenario KPI tables
+# --------------------------
+investments = {
+    "Baseline (No Innovation)": 0,
+    "Scenario 1 – Drop-in SAF": 250,
+    "Scenario 2 – Green Hydrogen": 400,
+    "Scenario 3 – Battery Electric": 350,
+    "Scenario 4 – Train for SH flights": 300,   # Updated scenario
+}
+
+# Phased investment plans (€) as described in the scenario narratives.
+# Scenarios without a stated plan fall back to the `investments` figure
+# (€ million) committed up front in 2025.
+investment_plans = {
+    "Scenario 3 – Battery Electric": {2040: 1_200_000_000, 2050: 1_200_000_000},
+    "Scenario 4 – Train for SH flights": {2025: 1_000_000_000, 2030: 1_000_000_000, 2040: 1_000_000_000},
+    "Best Scenario – Hybrid": {2025: 1_000_000_000, 2030: 600_000_000, 2040: 500_000_000},
+}
+
+# Technology adoption per scenario, as a share of the network it applies
+# to (Train and Electric replace short-haul flights; SAF and H2 are fuel
+# shares). Taken from the scenario narratives.
+technology_shares = {
+    "Scenario 1 – Drop-in SAF": {"SAF": {2025: 0.0, 2030: 0.25, 2040: 0.5, 2050: 0.7}},
+    "Scenario 2 – Green Hydrogen": {"H2": {2025: 0.0, 2030: 0.15, 2040: 0.5, 2050: 1.0}},
+    "Scenario 3 – Battery Electric": {"Electric": {2030: 0.0, 2040: 0.5, 2050: 0.75}},
+    "Scenario 4 – Train for SH flights": {"Train": {2025: 0.0, 2030: 0.25, 2040: 0.5, 2050: 0.75}},
+    "Best Scenario – Hybrid": {
+        "Train": {2025: 0.0, 2030: 0.25, 2040: 0.5, 2050: 0.75},
+        "SAF": {2025: 0.0, 2030: 0.2, 2040: 0.4, 2050: 0.6},
+    },
+}
+TECHNOLOGIES = ("SAF", "H2", "Electric", "Train")
+
+train_kpis = {
+    2030: {"Revenue": 1003000000, "Profit": 93000000, "Cashflow": -144000000, "Waste": 161987703, "CO2": 815461, "TRL": 9},
+    2040: {"Revenue": 1014000000, "Profit": 70000000, "Cashflow": 47000000, "Waste": 168791186, "CO2": 730146, "TRL": 9},
+    2050: {"Revenue": 1025000000, "Profit": 238000000, "Cashflow": 41000000, "Waste": 175880416, "CO2": 645831, "TRL": 9}
+}
+
+saf_kpis = {
+    2030: {"Revenue": 814102792, "Profit": 261921948, "Cashflow": 170760538, "Waste": 161987703, "CO2": 720635, "TRL": 9},
+    2040: {"Revenue": 870884190, "Profit": 244412043, "Cashflow": 112405480, "Waste": 168791186, "CO2": 540476, "TRL": 9},
+    2050: {"Revenue": 916321626, "Profit": 216304917, "Cashflow": 55093729, "Waste": 175880416, "CO2": 459785, "TRL": 9}
+}
+eflight_kpis = {
+    2030: {
+        "Revenue": 1_131_483_298.91,
+        "Profit": 249_046_359,
+        "Cashflow": 249_046_350,
+        "Waste": 163_328_532,
+        "CO2": 900_775,
+        "TRL": 9
+    },
+    2040: {
+        "Revenue": 379_746_000,
+        "Profit": -348_471_324,
+        "Cashflow": -348_471_324,
+        "Waste": 3_127_320,
+        "CO2": 0,
+        "TRL": 3
+    },
+    2050: {
+        "Revenue": 462_908_255,
+        "Profit": 65_690_931,
+        "Cashflow": -173_869_558,
+        "Waste": 3_127_320,
+        "CO2": 0,
+        "TRL": 1
+    }
+}
+
+
+best_kpis = {
+    2030: {
+        "Revenue": 1030904820,
+        "Profit": 51509579,
+        "Cashflow": -267732230,
+        "Waste": 161987703,
+        "CO2": 653753,
+        "TRL": 9
+    },
+    2040: {
+        "Revenue": 1047903920,
+        "Profit": 1457335,
+        "Cashflow": -408336284,
+        "Waste": 168791186,
+        "CO2": 442859,
+        "TRL": 9
+    },
+    2050: {
+        "Revenue": 1074234280,
+        "Profit": 198831371,
+        "Cashflow": 302465099,
+        "Waste": 175880416,
+        "CO2": 268093,
+        "TRL": 9
+    }
+}
+
+h2_kpis = {
+    2025: {
+        "Revenue": 993355902,
+        "Profit": 147079247,
+        "Cashflow": 147079247,
+        "Waste": 155458448,  # ← from your new waste list
+        "CO2": 900775,
+        "TRL": 5
+    },
+    2030: {
+        "Revenue": 930371089,
+        "Profit": -339602725,
+        "Cashflow": 540429564,
+        "Waste": 161987703,  # ← updated
+        "CO2": 846583,
+        "TRL": 5
+    },
+    2040: {
+        "Revenue": 1022918520,
+        "Profit": -216342744,
+        "Cashflow": 1700833067,
+        "Waste": 168791186,  # ← updated
+        "CO2": 720135,
+        "TRL": 6
+    },
+    2050: {
+        "Revenue": 1046588625,
+        "Profit": 470020020,
+        "Cashflow": 5057688490,
+        "Waste": 175880416,  # ← updated
+        "CO2": 575623,
+        "TRL": 6
+    }
+}
+
+baseline_kpis = {
+    2030: {
+        "Revenue": 1131483298.91,
+        "Profit": 249046359,
+        "Cashflow": 249046350,
+        "Waste": 163328532,
+        "CO2": 900775,
+        "TRL": 9
+    },
+    2040: {
+        "Revenue": 1173365667.52,
+        "Profit": 259721960.62,
+        "Cashflow": 2798225761,
+        "Waste": 171932393,
+        "CO2": 945814,
+        "TRL": 9
+    },
+    2050: {
+        "Revenue": 1247033426.61,
+        "Profit": 272730401.73,
+        "Cashflow": 5466991792,
+        "Waste": 188960715,
+        "CO2": 993105,
+        "TRL": 9
+    }
+}
+
+
+METRICS = ("Revenue", "Profit", "Cashflow", "Waste", "CO2", "TRL")
+BASELINE = "Baseline (No Innovation)"
+BEST_SCENARIO = "Best Scenario – Hybrid"
+
+scenario_tables = {
+    "Baseline (No Innovation)": baseline_kpis,
+    "Scenario 1 – Drop-in SAF": saf_kpis,
+    "Scenario 2 – Green Hydrogen": h2_kpis,
+    "Scenario 3 – Battery Electric": eflight_kpis,
+    "Scenario 4 – Train for SH flights": train_kpis,
+    "Best Scenario – Hybrid": best_kpis,
+}
+
+
+# --------------------------
+# Array-backed KPI store
+# --------------------------
+class KpiStore:
+    """Dense scenario × year × metric cube with NaN marking missing cells."""
+
+    def __init__(self, scenarios, years, metrics, values):
+        self.scenarios = [str(s) for s in scenarios]
+        self.years = [int(y) for y in years]
+        self.metrics = [str(m) for m in metrics]
+        self.values = np.asarray(values, dtype=float)
+        self.values.setflags(write=False)
+        self.missing = np.isnan(self.values)
+        self.scenario_index = {s: i for i, s in enumerate(self.scenarios)}
+        self.year_index = {y: i for i, y in enumerate(self.years)}
+        self.metric_index = {m: i for i, m in enumerate(self.metrics)}
+        labels = repr((self.scenarios, self.years, self.metrics)).encode()
+        self.digest = hashlib.sha1(labels + self.values.tobytes()).hexdigest()
+
+    @classmethod
+    def from_tables(cls, tables, metrics=METRICS):
+        years = sorted({year for table in tables.values() for year in table})
+        values = np.full((len(tables), len(years), len(metrics)), np.nan)
+        for i, table in enumerate(tables.values()):
+            for year, row in table.items():
+                values[i, years.index(year)] = [row.get(m, np.nan) for m in metrics]
+        return cls(tables.keys(), years, metrics, values)
+
+    @classmethod
+    def from_columns(cls, scenario, year, columns, metrics=METRICS):
+        """Build from long-format columns with one row per scenario/year.
+
+        ``columns`` maps metric names to value arrays; absent metrics stay
+        missing. Scenarios keep their first-seen order, years are sorted.
+        The values are copied into the dense cube, so memory-mapped columns
+        can be released afterwards. Raises ValueError on duplicate rows.
+        """
+        labels, first, inverse = np.unique(np.asarray(scenario, dtype=str), return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        years, y_codes = np.unique(np.asarray(year, dtype=int), return_inverse=True)
+        cells, counts = np.unique(rank[inverse] * len(years) + y_codes, return_counts=True)
+        if (counts > 1).any():
+            dupes = [f"{labels[order][c // len(years)]} {years[c % len(years)]}" for c in cells[counts > 1]]
+            raise ValueError(f"duplicate scenario/year row(s): {', '.join(dupes)}")
+        values = np.full((len(labels), len(years), len(metrics)), np.nan)
+        for m, metric in enumerate(metrics):
+            if metric in columns:
+                values[rank[inverse], y_codes, m] = np.asarray(columns[metric], dtype=float)
+        return cls(labels[order], years, metrics, values)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def value(self, scenario, year, metric):
+        try:
+            return self.values[
+                self.scenario_index[scenario], self.year_index[year], self.metric_index[metric]
+            ]
+        except KeyError:
+            return np.nan
+
+    def point(self, scenario, year):
+        """All metrics of one scenario/year; None when the cell is unknown."""
+        s = self.scenario_index.get(scenario)
+        y = self.year_index.get(year)
+        if s is None or y is None or self.missing[s, y].all():
+            return None
+        return self.values[s, y]
+
+    def scenario(self, scenario):
+        return self.values[self.scenario_index[scenario]]
+
+    def year(self, year):
+        return self.values[:, self.year_index[year]]
+
+    def metric(self, metric):
+        return self.values[:, :, self.metric_index[metric]]
+
+    def take(self, scenarios=None, years=None, metrics=None):
+        """Sub-cube for the given labels (all labels where None)."""
+        axes = zip(
+            (scenarios, years, metrics),
+            (self.scenario_index, self.year_index, self.metric_index),
+        )
+        idx = [list(index.values()) if labels is None else [index[x] for x in labels] for labels, index in axes]
+        return self.values[np.ix_(*idx)]
+
+    def known_years(self, scenario):
+        """Years with at least one KPI for the scenario."""
+        known = ~self.missing[self.scenario_index[scenario]].all(axis=1)
+        return [y for y, k in zip(self.years, known) if k]
+
+    @timed("get_kpi")
+    def get_kpi(self, scenario, year):
+        row = self.point(scenario, year)
+        if row is None:
+            return ("-",) * len(self.metrics)
+        return tuple("-" if np.isnan(v) else _plain(v) for v in row)
+
+
+def _plain(v):
+    # Whole numbers go back out as int so "9/9" and friends keep rendering as before.
+    v = float(v)
+    return int(v) if v.is_integer() else v
+
+
+# --------------------------
+# Dense annual KPI grid
+# --------------------------
+ANNUAL_YEARS = tuple(range(2025, 2051))
+# Metrics that move in jumps (investment rounds, readiness assessments)
+# are held at their last known value regardless of the chosen method.
+METRIC_INTERPOLATION = {"Cashflow": "step", "TRL": "step"}
+
+
+def _interpolate(x, y, xi, method):
+    """Interpolate rows of y (series × len(x)) at xi; NaN outside x[0]..x[-1]."""
+    out = np.full((len(y), len(xi)), np.nan)
+    inside = (xi >= x[0]) & (xi <= x[-1])
+    if inside.any():
+        out[:, inside] = _interpolate_inside(x, y, xi[inside], method)
+    return out
+
+
+def _interpolate_inside(x, y, xi, method):
+    if len(x) == 1:
+        return np.repeat(y, len(xi), axis=1)
+    if method == "step":
+        return y[:, np.searchsorted(x, xi, side="right") - 1]
+
+    k = np.clip(np.searchsorted(x, xi, side="right") - 1, 0, len(x) - 2)
+    h = np.diff(x)
+    t = (xi - x[k]) / h[k]
+    y0, y1 = y[:, k], y[:, k + 1]
+    if method == "linear":
+        return y0 + t * (y1 - y0)
+    if method != "monotone":
+        raise ValueError(f"unknown interpolation method: {method}")
+
+    # monotone cubic (PCHIP, Fritsch–Carlson slopes): no overshoot between points
+    delta = np.diff(y, axis=1) / h
+    slopes = np.zeros_like(y)
+    if len(x) == 2:
+        slopes[:] = delta
+    else:
+        w1, w2 = 2 * h[1:] + h[:-1], h[1:] + 2 * h[:-1]
+        d0, d1 = delta[:, :-1], delta[:, 1:]
+        same_sign = d0 * d1 > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            harmonic = (w1 + w2) / (w1 / d0 + w2 / d1)
+        slopes[:, 1:-1] = np.where(same_sign, harmonic, 0)
+        slopes[:, 0] = _end_slope(h[0], h[1], delta[:, 0], delta[:, 1])
+        slopes[:, -1] = _end_slope(h[-1], h[-2], delta[:, -1], delta[:, -2])
+    hk = h[k]
+    t2, t3 = t * t, t * t * t
+    return (
+        (2 * t3 - 3 * t2 + 1) * y0 + (t3 - 2 * t2 + t) * hk * slopes[:, k]
+        + (-2 * t3 + 3 * t2) * y1 + (t3 - t2) * hk * slopes[:, k + 1]
+    )
+
+
+def _end_slope(h0, h1, d0, d1):
+    slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+    slope = np.where(np.sign(slope) != np.sign(d0), 0, slope)
+    return np.where((np.sign(d0) != np.sign(d1)) & (np.abs(slope) > 3 * np.abs(d0)), 3 * d0, slope)
+
+
+@lru_cache(maxsize=16)
+def annual_grid(store, years=ANNUAL_YEARS, method="linear"):
+    """KpiStore with a value for every year, interpolated through the known KPIs.
+
+    Series sharing the same known years are interpolated together in one
+    array operation. Years before a series' first or after its last known
+    value are not extrapolated and stay missing, as do series without any
+    known value. ``method`` is one of INTERPOLATION_METHODS.
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"unknown interpolation method: {method}")
+    xi = np.asarray(years, dtype=float)
+    anchors = np.asarray(store.years, dtype=float)
+    n_scen, _, n_met = store.shape
+    series = store.values.transpose(0, 2, 1).reshape(n_scen * n_met, -1)
+    known = ~np.isnan(series)
+    methods = np.array([METRIC_INTERPOLATION.get(m, method) for m in store.metrics] * n_scen)
+    out = np.full((len(series), len(xi)), np.nan)
+    for pattern in np.unique(known, axis=0):
+        if not pattern.any():
+            continue
+        rows = (known == pattern).all(axis=1)
+        for m in np.unique(methods[rows]):
+            sel = rows & (methods == m)
+            out[sel] = _interpolate(anchors[pattern], series[sel][:, pattern], xi, m)
+    values = out.reshape(n_scen, n_met, -1).transpose(0, 2, 1)
+    return KpiStore(store.scenarios, years, store.metrics, values)
+
+
+def hold_ends(values):
+    """Copy of ``values`` (..., year) with each series' first and last known
+    value held over the missing years before and after them.
+
+    For calculations that need a full horizon (cash flows discounted from
+    BASE_YEAR, calibration factors); annual_grid itself leaves these years
+    missing.
+    """
+    values = np.asarray(values, dtype=float)
+    known = ~np.isnan(values)
+    n = values.shape[-1]
+    first = known.argmax(axis=-1)
+    last = n - 1 - known[..., ::-1].argmax(axis=-1)
+    idx = np.clip(np.arange(n), first[..., None], last[..., None])
+    return np.take_along_axis(values, idx, axis=-1)
+
+
+kpi_store = KpiStore.from_tables(scenario_tables)
+
+
+def get_kpi(scenario, year, investment=None):
+    return kpi_store.get_kpi(scenario, year)
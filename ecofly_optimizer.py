@@ -0,0 +1,238 @@
+from collections import namedtuple
+from itertools import combinations_with_replacement
+
+import numpy as np
+
+from ecofly_kpis import BASELINE, TECHNOLOGIES, KpiStore, technology_shares
+from ecofly_perf import timed
+from ecofly_simulation import BASE_YEAR, investment_schedule, technology_schedule, worker_pool
+
+# --------------------------
+# Technology portfolio optimizer
+# --------------------------
+# Each single-technology scenario tells us what its technology does per
+# unit of adoption share: (scenario - baseline) / share, per year and KPI.
+# A candidate portfolio sets a share per technology per decade; its KPIs
+# are the baseline plus the share-weighted effects, which makes scoring a
+# single matrix product per batch of candidates.
+#
+# Shares only grow over time, a technology can only be adopted in decades
+# where its reference scenario uses it at the required TRL, and SAF, H2
+# and battery-electric together cover at most the whole flown fleet (train
+# substitution replaces short-haul flights and is counted separately).
+DECADES = (2030, 2040, 2050)
+OBJECTIVES = ("CO2", "Profit", "Cashflow")
+FLEET_TECHNOLOGIES = ("SAF", "H2", "Electric")
+REFERENCE_SCENARIOS = {
+    next(iter(shares)): scenario for scenario, shares in technology_shares.items() if len(shares) == 1
+}
+OPT_CHUNK = 250_000
+
+ParetoFront = namedtuple("ParetoFront", "shares co2 cashflow investment trl candidates evaluated feasible years")
+
+
+def technology_effects(store, investments=None):
+    """Per-unit-share effects and the constraints' inputs for every technology.
+
+    Capex per unit share comes from each reference scenario's investment
+    schedule; ``investments`` as in ecofly_simulation.investment_schedule.
+    """
+    years = np.asarray(store.years)
+    metrics = [store.metric_index[m] for m in OBJECTIVES]
+    base = store.values[store.scenario_index[BASELINE]][:, metrics]
+    effects = np.zeros((len(TECHNOLOGIES), len(years), len(OBJECTIVES)))
+    available = np.zeros((len(TECHNOLOGIES), len(DECADES)), dtype=bool)
+    trl = np.zeros((len(TECHNOLOGIES), len(DECADES)))
+    capex = np.zeros(len(TECHNOLOGIES))
+    decade_idx = [store.year_index[d] for d in DECADES]
+    for t, tech in enumerate(TECHNOLOGIES):
+        scenario = REFERENCE_SCENARIOS.get(tech)
+        if scenario not in store.scenario_index:
+            continue
+        share = technology_schedule(tech, [scenario], years)[0]
+        row = store.values[store.scenario_index[scenario]]
+        used = share > 0
+        effects[t, used] = (row[used][:, metrics] - base[used]) / share[used, None]
+        trl[t] = row[decade_idx, store.metric_index["TRL"]]
+        available[t] = used[decade_idx]
+        capex[t] = sum(investment_schedule(scenario, investments).values()) / share.max()
+    return base, effects, available, trl, capex
+
+
+def objective_years(store):
+    """Years where the baseline's objectives are known, which cumulative totals cover."""
+    base = store.take([BASELINE], None, OBJECTIVES)[0]
+    return [y for y, known in zip(store.years, ~np.isnan(base).any(axis=1)) if known]
+
+
+def decade_weights(years):
+    """(decade, year) weights spreading decade shares linearly, from 0 in BASE_YEAR."""
+    anchors = [BASE_YEAR, *DECADES]
+    return np.stack([np.interp(years, anchors, np.eye(len(anchors))[i + 1]) for i in range(len(DECADES))])
+
+
+def share_options(levels, available):
+    """Non-decreasing decade share sequences, zero where the technology is unavailable."""
+    options = np.array(list(combinations_with_replacement(levels, len(DECADES))))
+    return options[(options[:, ~available] == 0).all(axis=1)]
+
+
+def _record_highs(values):
+    return np.r_[True, values[1:] > np.maximum.accumulate(values)[:-1]]
+
+
+def pareto_mask(co2, cashflow):
+    """Points not dominated by one with lower-or-equal CO2 and higher cashflow."""
+    keep = np.zeros(len(co2), dtype=bool)
+    if not len(co2):
+        return keep
+    # More CO2 than the best-cashflow point or less cashflow than the
+    # lowest-CO2 point is dominated outright. A plain sort of the rest by
+    # CO2 gives a small superset of the front (ties in any order); the
+    # two-key sort that settles ties only runs on that superset.
+    low, high = np.argmin(co2), np.argmax(cashflow)
+    rest = np.flatnonzero((co2 <= co2[high]) & (cashflow >= cashflow[low]))
+    rest = rest[np.argsort(co2[rest])]
+    rest = rest[_record_highs(cashflow[rest])]
+    rest = rest[np.lexsort((-cashflow[rest], co2[rest]))]
+    keep[rest[_record_highs(cashflow[rest])]] = True
+    return keep
+
+
+def _partial_portfolios(options, base, effects, invest_per_option, budget):
+    """Budget- and fleet-feasible option combinations for all but the last technology.
+
+    Built one technology at a time so infeasible prefixes are dropped before
+    they multiply. Returns (option index rows, investment, fleet share,
+    KPIs without the last technology) per surviving prefix.
+    """
+    picks = np.zeros((1, 0), dtype=np.int32)
+    invest = np.zeros(1)
+    fleet = np.zeros((1, len(DECADES)))
+    effect = base[None]
+    for t, tech in enumerate(TECHNOLOGIES[:-1]):
+        cost = invest[:, None] + invest_per_option[t]
+        share = fleet[:, None] + (options[t] if tech in FLEET_TECHNOLOGIES else 0)
+        i, j = np.nonzero((cost <= budget) & (share <= 1 + 1e-9).all(axis=2))
+        picks = np.column_stack([picks[i], j])
+        invest, fleet, effect = cost[i, j], share[i, j], effect[i] + effects[t][j]
+    return picks, invest, fleet, effect
+
+
+def _exact_min(a, b, i, j):
+    return (a[i] + b[j]).min(axis=1)
+
+
+def _score_chunk(picks, invest, fleet, effect, last, last_effect, last_invest, budget, min_profit):
+    # Complete each partial portfolio with every option of the last technology.
+    # Annual CO2 (clipped at zero) and profit (checked every year) are only
+    # summed year by year where cheap per-row bounds cannot settle them.
+    years = (effect.shape[1] - 1) // 2
+    a_co2, a_profit = effect[:, :years], effect[:, years:2 * years]
+    b_co2, b_profit = last_effect[:, :years], last_effect[:, years:2 * years]
+    cost = invest[:, None] + last_invest
+    ok = cost <= budget
+    if TECHNOLOGIES[-1] in FLEET_TECHNOLOGIES:
+        ok &= (fleet[:, None] + last <= 1 + 1e-9).all(axis=2)
+    i, j = np.nonzero(ok)
+
+    a_low = a_profit.argmin(axis=1)
+    lower = a_profit.min(axis=1)[i] + b_profit.min(axis=1)[j]
+    upper = a_profit[i, a_low[i]] + b_profit[j, a_low[i]]
+    feasible = lower >= min_profit
+    unsure = ~feasible & (upper >= min_profit)
+    feasible[unsure] = _exact_min(a_profit, b_profit, i[unsure], j[unsure]) >= min_profit
+    i, j = i[feasible], j[feasible]
+
+    co2 = a_co2.sum(axis=1)[i] + b_co2.sum(axis=1)[j]
+    negative = a_co2.min(axis=1)[i] + b_co2.min(axis=1)[j] < 0
+    co2[negative] = np.clip(a_co2[i[negative]] + b_co2[j[negative]], 0, None).sum(axis=1)
+    cashflow = effect[i, -1] + last_effect[j, -1]
+
+    front = pareto_mask(co2, cashflow)
+    return (picks[i[front]], j[front], co2[front], cashflow[front], cost[i[front], j[front]],
+            int(ok.sum()), len(i))
+
+
+@timed("optimize_portfolio")
+def optimize_portfolio(store, budget=4e9, min_trl=6, min_profit=0.0, step=0.25, parallel=None, investments=None):
+    """Pareto front of cumulative CO2 vs cumulative cashflow over the share grid.
+
+    ``store`` is an annual KpiStore (e.g. from ecofly_simulation.simulate),
+    so the front follows the current assumptions. Shares move in ``step``
+    increments between 0 and 1 per technology and decade. Cumulative CO2
+    and cashflow cover the objective_years.
+    """
+    years = objective_years(store)
+    store = KpiStore(store.scenarios, years, store.metrics, store.take(None, years))
+    base, effects, available, trl, capex = technology_effects(store, investments)
+    available &= trl >= min_trl
+    weights = decade_weights(np.asarray(store.years))
+    levels = np.round(np.arange(0, 1 + step / 2, step), 6)
+    options = [share_options(levels, available[t]) for t in range(len(TECHNOLOGIES))]
+
+    # KPI effect of every option, laid out as [CO2 per year, profit per year,
+    # cumulative cashflow]; a portfolio's KPIs are the baseline plus the sum.
+    def layout(kpis):
+        return np.concatenate([kpis[..., 0], kpis[..., 1], kpis[..., 2].sum(axis=-1, keepdims=True)], axis=-1)
+
+    option_effects = [layout((o @ weights)[..., None] * effects[t]) for t, o in enumerate(options)]
+    option_invest = [o.max(axis=1) * capex[t] for t, o in enumerate(options)]
+    picks, invest, fleet, effect = _partial_portfolios(options, layout(base), option_effects, option_invest, budget)
+
+    rows = max(1, OPT_CHUNK // len(options[-1]))
+    args = [
+        (picks[lo:lo + rows], invest[lo:lo + rows], fleet[lo:lo + rows], effect[lo:lo + rows],
+         options[-1], option_effects[-1], option_invest[-1], budget, min_profit)
+        for lo in range(0, len(picks), rows)
+    ]
+    if parallel is None:
+        parallel = len(args) > 1
+    if parallel:
+        parts = list(worker_pool().map(_score_chunk, *zip(*args)))
+    else:
+        parts = [_score_chunk(*a) for a in args]
+
+    prefix, last, co2, cashflow, invest = (np.concatenate([p[i] for p in parts]) for i in range(5))
+    front = np.flatnonzero(pareto_mask(co2, cashflow))
+    front = front[np.argsort(co2[front])]
+    shares = np.stack(
+        [options[t][prefix[front, t]] for t in range(len(TECHNOLOGIES) - 1)] + [options[-1][last[front]]], axis=1
+    )
+    used_trl = np.where(shares > 0, trl, np.inf).min(axis=(1, 2))
+    return ParetoFront(
+        shares, co2[front], cashflow[front], invest[front], np.where(np.isinf(used_trl), 9, used_trl),
+        int(np.prod([len(o) for o in options])), sum(p[5] for p in parts), sum(p[6] for p in parts), years,
+    )
+
+
+def portfolio_label(shares):
+    """e.g. "SAF 25/50/70% · Train 25/50/75%" for one (technology, decade) share array."""
+    return " · ".join(
+        f"{tech} " + "/".join(f"{v:.0%}".rstrip("%") for v in row) + "%"
+        for tech, row in zip(TECHNOLOGIES, shares) if row.any()
+    ) or "No innovation"
+
+
+def scenario_totals(store):
+    """Cumulative (CO2, cashflow) per scenario over the front's years, for comparison with it."""
+    years = objective_years(store)
+    co2 = np.clip(store.take(None, years, ["CO2"])[..., 0], 0, None)
+    cashflow = store.take(None, years, ["Cashflow"])[..., 0]
+    return {
+        s: (float(np.nansum(co2[i])), float(np.nansum(cashflow[i])))
+        for s, i in store.scenario_index.items()
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    from ecofly_simulation import simulate
+
+    store = simulate()
+    for step, budget in ((0.25, 4e9), (0.1, 4e9), (0.1, 8e9)):
+        start = time.perf_counter()
+        front = optimize_portfolio(store, budget=budget, step=step, min_trl=1, min_profit=-1e9)
+        print(f"step {step}: {front.candidates:,} on the grid, {front.evaluated:,} scored, {front.feasible:,} feasible, "
+              f"{len(front.co2)} on the front in {time.perf_counter() - start:.2f}s")
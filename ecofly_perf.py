@@ -0,0 +1,203 @@
+import importlib
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+log = logging.getLogger(__name__)
+
+# --------------------------
+# Startup timing
+# --------------------------
+# Heavy libraries are imported on first use by the pages that need them;
+# lazy_import records what each first import cost, and first_render how
+# long each page took the first time this process rendered it.
+PROCESS_START = time.perf_counter()
+import_times = {}
+first_render_times = {}
+
+
+def lazy_import(*names):
+    modules = []
+    for name in names:
+        if name not in sys.modules:
+            start = time.perf_counter()
+            importlib.import_module(name)
+            import_times[name] = time.perf_counter() - start
+        modules.append(sys.modules[name])
+    return modules[0] if len(modules) == 1 else modules
+
+
+@contextmanager
+def first_render(page):
+    if page in first_render_times:
+        yield
+        return
+    start = time.perf_counter()
+    yield
+    end = time.perf_counter()
+    first_render_times[page] = (end - start, end - PROCESS_START)
+    log.info("first render of %s: %.3fs (%.3fs after startup)", page, end - start, end - PROCESS_START)
+
+
+def startup_report_markdown():
+    lines = ["**Imports (first use)**", "", "| module | seconds |", "|---|---|"]
+    lines += [f"| {name} | {secs:.3f} |" for name, secs in import_times.items()]
+    lines += ["", "**First render per page**", "", "| page | render s | after startup s |", "|---|---|---|"]
+    lines += [f"| {page} | {secs:.3f} | {since:.3f} |" for page, (secs, since) in first_render_times.items()]
+    return "\n".join(lines)
+
+
+def startup_report_enabled(query_params):
+    return bool(os.environ.get("ECOFLY_STARTUP_REPORT")) or "startup" in query_params
+
+
+# --------------------------
+# Hot-path instrumentation
+# --------------------------
+# Each script run happens on its own thread, so the active recorder is
+# thread-local. With no recorder the hooks cost one attribute lookup.
+_local = threading.local()
+_NULL = nullcontext()
+metrics_log = logging.getLogger("ecofly.metrics")
+if os.environ.get("ECOFLY_PERF_LOG"):
+    _handler = logging.FileHandler(os.environ["ECOFLY_PERF_LOG"], encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    metrics_log.addHandler(_handler)
+    metrics_log.setLevel(logging.INFO)
+
+
+class RerunMetrics:
+    """Per-stage call counts and inclusive time, plus free-form counters, for one rerun."""
+
+    def __init__(self, page):
+        self.page = page
+        self.stages = defaultdict(lambda: [0, 0.0])
+        self.counters = Counter()
+        self.start = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages[name]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            "page": self.page,
+            "total_ms": round((self.total or 0) * 1000, 3),
+            "stages": {name: {"calls": n, "ms": round(secs * 1000, 3)} for name, (n, secs) in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+
+def perf_enabled(query_params):
+    return bool(os.environ.get("ECOFLY_PERF")) or "perf" in query_params
+
+
+@contextmanager
+def recording(page, enabled=True):
+    """Collect stage timings for the enclosed rerun; yields None when disabled."""
+    if not enabled and not metrics_log.isEnabledFor(logging.INFO):
+        yield None
+        return
+    metrics = _local.metrics = RerunMetrics(page)
+    try:
+        yield metrics
+    finally:
+        _local.metrics = None
+        metrics.total = time.perf_counter() - metrics.start
+        if metrics_log.isEnabledFor(logging.INFO):
+            metrics_log.info(json.dumps({"ts": time.time(), **metrics.as_dict()}, ensure_ascii=False))
+
+
+def recording_active():
+    return getattr(_local, "metrics", None) is not None
+
+
+def stage(name):
+    metrics = getattr(_local, "metrics", None)
+    return _NULL if metrics is None else metrics.stage(name)
+
+
+def timed(name):
+    def wrap(func):
+        @wraps(func)
+        def call(*args, **kwargs):
+            metrics = getattr(_local, "metrics", None)
+            if metrics is None:
+                return func(*args, **kwargs)
+            with metrics.stage(name):
+                return func(*args, **kwargs)
+        return call
+    return wrap
+
+
+def count(name, n=1):
+    metrics = getattr(_local, "metrics", None)
+    if metrics is not None:
+        metrics.counters[name] += n
+
+
+def rerun_report_markdown(metrics):
+    lines = [f"**{metrics.page}** – {metrics.total * 1000:.1f} ms", "", "| stage | calls | ms |", "|---|---|---|"]
+    for name, (n, secs) in sorted(metrics.stages.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"| {name} | {n} | {secs * 1000:.2f} |")
+    caches = sorted({key.split(".")[1] for key in metrics.counters if key.startswith("cache.")})
+    if caches:
+        lines += ["", "| cache | hits | misses |", "|---|---|---|"]
+        for name in caches:
+            calls, misses = metrics.counters[f"cache.{name}.calls"], metrics.counters[f"cache.{name}.misses"]
+            lines.append(f"| {name} | {calls - misses} | {misses} |")
+    # ecofly_prewarm.attach: artifacts mapped from the shared dir vs computed here
+    shared = sorted({key[len("shared."):].rsplit(".", 1)[0] for key in metrics.counters if key.startswith("shared.")})
+    if shared:
+        lines += ["", "| shared artifact | hits | misses |", "|---|---|---|"]
+        for name in shared:
+            hits, misses = metrics.counters[f"shared.{name}.hits"], metrics.counters[f"shared.{name}.misses"]
+            lines.append(f"| {name} | {hits} | {misses} |")
+    return "\n".join(lines)
+
+
+# --------------------------
+# Offline import-time breakdown
+# --------------------------
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_breakdown(modules):
+    """Cumulative cold import time (s) per top-level import, via -X importtime."""
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    roots = {m.split(".")[0] for m in modules}
+    totals = {}
+    for match in IMPORT_LINE.finditer(proc.stderr):
+        _, cumulative, indent, name = match.groups()
+        if not indent and name.split(".")[0] in roots:
+            totals[name] = totals.get(name, 0.0) + int(cumulative) / 1e6
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+if __name__ == "__main__":
+    breakdown = import_breakdown([
+        "streamlit", "numpy", "pandas", "plotly.graph_objects", "plotly.express", "PIL.Image",
+        "ecofly_kpis", "ecofly_simulation", "ecofly_datasource", "ecofly_figures",
+    ])
+    for name, secs in breakdown.items():
+        print(f"{secs:8.3f}s  {name}")
+    print(f"{sum(breakdown.values()):8.3f}s  total")
@@ -0,0 +1,235 @@
+import hashlib
+import importlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ecofly_perf import count
+
+log = logging.getLogger(__name__)
+
+# --------------------------
+# Shared precomputation
+# --------------------------
+# `python ecofly_prewarm.py` runs once before the Streamlit servers start
+# (see .devcontainer/devcontainer.json). It computes what every server
+# process would otherwise build for its first visitors at the default
+# assumptions: the annual simulation, the sensitivity sweep, the
+# bottom-up flight model and the Monte Carlo bands, plus the logo
+# variants and the static chart snapshots. Results go to SHARED_DIR, one
+# directory per artifact and input set: every array as a .npy file, and
+# the structure around them (tuples, dicts, KpiStores, plain values) as
+# JSON. Nothing is unpickled, and only the result types in SHARED_TYPES
+# are rebuilt.
+#
+# SHARED_DIR must be a directory of the user running the servers that no
+# one else can write to (created with mode 0700 when missing); otherwise
+# nothing is published or attached.
+#
+# Server processes attach on first use: arrays are memory-mapped
+# read-only, so however many processes run, the pages exist once in the
+# OS page cache. An artifact that is missing, or was built from other
+# data (different digest) or other inputs, is computed locally as before.
+SHARED_DIR = Path(os.environ.get("ECOFLY_SHARED_DIR") or Path(tempfile.gettempdir()) / f"ecofly-shared-{os.getuid()}")
+PREWARM_VERSION = "2"  # bump when an artifact's layout or its inputs change
+MIN_SHARED_BYTES = 1 << 14  # smaller arrays are read into memory rather than mapped
+MC_SAMPLES = 10_000         # the trend charts' default sample count
+STALE_TMP_SECONDS = 3600    # a half-written artifact this old belongs to a prewarm that died
+SHARED_TYPES = ("ecofly_sensitivity.Sensitivity", "ecofly_flights.FlightEmissions")
+
+
+def artifact_key(name, digest, *params):
+    text = repr((PREWARM_VERSION, name, digest, params))
+    return f"{name}-{hashlib.blake2b(text.encode(), digest_size=12).hexdigest()}"
+
+
+def private_dir(path, create=False):
+    """``path`` if it is a directory owned by this user and writable by no
+    one else, else None; created with mode 0700 first when ``create`` is set.
+    """
+    path = Path(path)
+    if create:
+        try:
+            path.mkdir(mode=0o700, parents=True)
+        except FileExistsError:
+            pass
+    try:
+        info = os.lstat(path)  # a symlink is refused, not followed
+    except OSError:
+        return None
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        return None
+    return path
+
+
+def _encode(obj, arrays):
+    # JSON-able skeleton; arrays (recursively through tuples, lists, dicts,
+    # KpiStores and the SHARED_TYPES) become references to their files.
+    from ecofly_kpis import KpiStore
+
+    if isinstance(obj, np.ndarray):
+        arrays.append(obj)
+        return {"array": f"{len(arrays) - 1}.npy"}
+    if isinstance(obj, KpiStore):
+        return {"store": [obj.scenarios, list(obj.years), obj.metrics, _encode(obj.values, arrays)]}
+    if isinstance(obj, tuple) and hasattr(obj, "_fields"):
+        kind = f"{type(obj).__module__}.{type(obj).__qualname__}"
+        if kind not in SHARED_TYPES:
+            raise TypeError(f"cannot share {kind}")
+        return {"record": kind, "fields": [_encode(v, arrays) for v in obj]}
+    if isinstance(obj, tuple):
+        return {"tuple": [_encode(v, arrays) for v in obj]}
+    if isinstance(obj, list):
+        return [_encode(v, arrays) for v in obj]
+    if isinstance(obj, dict):
+        return {"dict": [[_encode(k, arrays), _encode(v, arrays)] for k, v in obj.items()]}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    raise TypeError(f"cannot share {type(obj).__name__}")
+
+
+def _decode(obj, path):
+    from ecofly_kpis import KpiStore
+
+    if isinstance(obj, list):
+        return [_decode(v, path) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if "array" in obj:
+        file = path / Path(obj["array"]).name
+        mode = "r" if file.stat().st_size >= MIN_SHARED_BYTES else None
+        return np.load(file, mmap_mode=mode, allow_pickle=False)
+    if "store" in obj:
+        scenarios, years, metrics, values = obj["store"]
+        return KpiStore(scenarios, years, metrics, _decode(values, path))
+    if "record" in obj:
+        if obj["record"] not in SHARED_TYPES:
+            raise TypeError(f"cannot share {obj['record']}")
+        module, name = obj["record"].rsplit(".", 1)
+        return getattr(importlib.import_module(module), name)(*(_decode(v, path) for v in obj["fields"]))
+    if "tuple" in obj:
+        return tuple(_decode(v, path) for v in obj["tuple"])
+    return {_decode(k, path): _decode(v, path) for k, v in obj["dict"]}
+
+
+def publish(obj, name, digest, *params, shared_dir=SHARED_DIR):
+    """Write ``obj`` for others to attach to; returns its directory."""
+    shared_dir = private_dir(shared_dir, create=True)
+    if shared_dir is None:
+        raise PermissionError("the shared directory must be owned by this user and not writable by others")
+    path = shared_dir / artifact_key(name, digest, *params)
+    arrays = []
+    skeleton = _encode(obj, arrays)
+    tmp = Path(tempfile.mkdtemp(dir=shared_dir, prefix=".tmp-"))
+    for i, array in enumerate(arrays):
+        np.save(tmp / f"{i}.npy", np.ascontiguousarray(array), allow_pickle=False)
+    (tmp / "object.json").write_text(json.dumps(skeleton), encoding="utf-8")
+    if path.exists():
+        shutil.rmtree(path)
+    try:
+        os.rename(tmp, path)  # readers see the whole directory or none of it
+    except OSError:  # a concurrent prewarm got there first
+        shutil.rmtree(tmp, ignore_errors=True)
+    log.info("published %s (%d arrays, %.1f MB)", path.name, len(arrays), sum(a.nbytes for a in arrays) / 1e6)
+    return path
+
+
+def attach(name, digest, *params, shared_dir=SHARED_DIR):
+    """The shared artifact for these inputs with its arrays mapped read-only, or None."""
+    shared_dir = private_dir(shared_dir)
+    try:
+        if shared_dir is None:
+            raise FileNotFoundError
+        path = shared_dir / artifact_key(name, digest, *params)
+        obj = _decode(json.loads((path / "object.json").read_text(encoding="utf-8")), path)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        count(f"shared.{name}.misses")
+        return None
+    count(f"shared.{name}.hits")
+    return obj
+
+
+# --------------------------
+# Pre-warm
+# --------------------------
+def prewarm(shared_dir=SHARED_DIR, snapshots=True):
+    """Build and publish every shared artifact; returns {artifact: seconds}."""
+    import ecofly_assets
+    import ecofly_flights
+    import ecofly_sensitivity
+    import ecofly_simulation
+    from ecofly_assumptions import DEFAULT_ASSUMPTIONS
+    from ecofly_datasource import default_source
+
+    data = default_source().current()
+    raw = data.store
+    a, method, plans = DEFAULT_ASSUMPTIONS, "linear", tuple(data.investments.items())
+    timings = {}
+    written = set()
+
+    def run(label, build):
+        start = time.perf_counter()
+        obj = build()
+        timings[label] = time.perf_counter() - start
+        return obj
+
+    def share(label, build, name, *params):
+        written.add(publish(run(label, build), name, raw.digest, *params, shared_dir=shared_dir).name)
+
+    # The same names and inputs as the dashboard's cached functions
+    share("simulation", lambda: ecofly_simulation.simulate(a, raw, interpolation=method, investments=data.investments),
+          "simulated_store", a, method, plans)
+    share("sensitivity", lambda: ecofly_sensitivity.sensitivity(a, raw, interpolation=method,
+                                                                investments=data.investments),
+          "sensitivity_sweep", a, method, plans)
+
+    def flights():
+        result = ecofly_flights.simulate_flights(raw.scenarios)
+        return result, ecofly_flights.flight_store(result, ecofly_flights.calibration(result, raw))
+
+    share("flight emissions", flights, "flight_emissions")
+    for scenario in raw.scenarios:
+        share(f"Monte Carlo: {scenario}", lambda: ecofly_simulation.monte_carlo(
+            a, scenario, n_samples=MC_SAMPLES, store=raw, interpolation=method, investments=data.investments
+        ), "monte_carlo_bands", a, method, plans, scenario, MC_SAMPLES)
+
+    # Files the app already reuses across processes
+    run("logo variants", ecofly_assets.build_logo_variants)
+    if snapshots:
+        import ecofly_snapshots
+        run("chart snapshots", lambda: ecofly_snapshots.export_snapshots(data))
+
+    # Artifacts of older data or versions; processes still mapping them keep
+    # their open files. Another prewarm may be writing a .tmp- directory right
+    # now, so only ones left behind long ago go.
+    for path in Path(shared_dir).iterdir():
+        if path.name in written:
+            continue
+        if path.name.startswith(".tmp-") and time.time() - path.stat().st_mtime < STALE_TMP_SECONDS:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+    return timings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute shared artifacts before starting the dashboard.")
+    parser.add_argument("--shared-dir", type=Path, default=SHARED_DIR)
+    parser.add_argument("--no-snapshots", action="store_true", help="skip the static chart snapshots")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    for name, secs in prewarm(args.shared_dir, not args.no_snapshots).items():
+        print(f"{name:<48} {secs:7.2f} s")
+    print(f"pre-warmed {args.shared_dir} in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,142 @@
+import numpy as np
+
+from ecofly_kpis import hold_ends
+from ecofly_perf import timed
+
+# --------------------------
+# Sub-annual emissions
+# --------------------------
+# The annual CO2 path is spread over months, weeks or days with a seasonal
+# profile: twelve monthly weights (mean 1), interpolated periodically
+# between month centres. Each calendar year still sums to its annual
+# value, so the seasonal view never disagrees with the KPI tables; years
+# without an annual value stay missing.
+RESOLUTIONS = {"monthly": ("M", 1), "weekly": ("D", 7), "daily": ("D", 1)}
+SEASONAL_AMPLITUDE = 0.04   # ±4% around the mean, as in the original Scenario 4 sketch
+PEAK_MONTH = 7              # July: leisure traffic peaks in the summer holidays
+MAX_POINTS = 1_500          # per trace, after downsampling
+
+
+def seasonal_profile(amplitude=SEASONAL_AMPLITUDE, peak_month=PEAK_MONTH):
+    """Twelve monthly weights (mean 1) of a sine season peaking in ``peak_month``."""
+    months = np.arange(12)
+    return 1 + amplitude * np.cos(2 * np.pi * (months - (peak_month - 1)) / 12)
+
+
+def period_starts(resolution, first_year, last_year):
+    unit, step = RESOLUTIONS[resolution]
+    if unit == "M":
+        return np.arange(f"{first_year}-01", f"{last_year + 1}-01", step, dtype="datetime64[M]").astype("datetime64[D]")
+    return np.arange(f"{first_year}-01-01", f"{last_year + 1}-01-01", step, dtype="datetime64[D]")
+
+
+@timed("seasonal_series")
+def emissions_series(store, resolution="monthly", profile=None, metric="CO2"):
+    """(period start dates, values of shape (scenario, period)) for every scenario.
+
+    ``store`` should be annual (e.g. from ecofly_simulation.simulate);
+    ``profile`` defaults to seasonal_profile().
+    """
+    profile = seasonal_profile() if profile is None else np.asarray(profile, dtype=float)
+    profile = profile / profile.mean()
+    years = np.asarray(store.years)
+    annual = store.metric(metric)
+    t = period_starts(resolution, years[0], years[-1])
+
+    year_start = t.astype("datetime64[Y]")
+    year = year_start.astype(int) + 1970
+    days_in_year = ((year_start + 1).astype("datetime64[D]") - year_start.astype("datetime64[D]")).astype(float)
+    # Each period is placed in the season by its midpoint.
+    ends = np.append(t[1:], np.datetime64(f"{years[-1] + 1}-01-01", "D"))
+    middle = (t - year_start.astype("datetime64[D]")).astype(float) + (ends - t).astype(float) / 2
+    phase = middle / days_in_year
+
+    # Level: annual values placed mid-year and interpolated linearly. The
+    # ends are held so the first and last known years get a full shape;
+    # the unknown years drop out again in the rescale below.
+    filled = hold_ends(annual)
+    position = np.clip(year + phase - years[0] - 0.5, 0, len(years) - 1)
+    i0 = np.minimum(position.astype(int), len(years) - 2) if len(years) > 1 else np.zeros(len(t), dtype=int)
+    frac = position - i0
+    i1 = np.minimum(i0 + 1, len(years) - 1)
+    level = filled[:, i0] * (1 - frac) + filled[:, i1] * frac
+
+    season = np.interp(phase, (np.arange(12) + 0.5) / 12, profile, period=1)
+    raw = level * season
+
+    # Rescale so every calendar year sums to its annual value (NaN where unknown).
+    year_idx = year - years[0]
+    starts = np.searchsorted(year_idx, np.arange(len(years)))
+    totals = np.add.reduceat(raw, starts, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(totals != 0, annual / totals, 0)
+    return t, raw * scale[:, year_idx]
+
+
+# --------------------------
+# Shape-preserving downsampling
+# --------------------------
+def lttb(x, y, n_out):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of ``len(x)``."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            cx, cy = x[hi:edges[b + 2]].mean(), y[hi:edges[b + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+    return keep
+
+
+def visible_points(t, values, window=None, max_points=MAX_POINTS):
+    """Per row, the (dates, values) inside ``window`` downsampled to ``max_points``.
+
+    Zooming in narrows the window, so the same point budget shows more detail.
+    """
+    mask = np.ones(len(t), dtype=bool)
+    if window is not None:
+        lo, hi = (np.datetime64(w, "D") for w in window)
+        mask = (t >= lo) & (t <= hi)
+    t = t[mask]
+    x = t.astype("int64")
+    out = []
+    for row in values[:, mask]:
+        ok = ~np.isnan(row)
+        idx = np.flatnonzero(ok)[lttb(x[ok], row[ok], max_points)]
+        out.append((t[idx], row[idx]))
+    return out
+
+
+def calendar_error(store, resolution="monthly", metric="CO2"):
+    """Largest relative gap between a known year's periods summed and its annual value."""
+    t, values = emissions_series(store, resolution, metric=metric)
+    year = t.astype("datetime64[Y]").astype(int) + 1970
+    annual = store.metric(metric)
+    sums = np.stack([values[:, year == y].sum(axis=1) for y in store.years], axis=1)
+    known = ~np.isnan(annual)
+    return float(np.max(np.abs(sums[known] - annual[known]) / np.maximum(np.abs(annual[known]), 1)))
+
+
+if __name__ == "__main__":
+    from ecofly_simulation import simulate
+
+    store = simulate()
+    for resolution in RESOLUTIONS:
+        print(f"{resolution:<8} max calendar-year error: {calendar_error(store, resolution):.2e}")
+    t, values = emissions_series(store)
+    for s, scenario in enumerate(store.scenarios):
+        first = store.known_years(scenario)[0]
+        months = values[s, t.astype("datetime64[Y]").astype(int) + 1970 == first]
+        print(f"{scenario:<36} {first}: {months.sum():>12,.0f} of {store.value(scenario, first, 'CO2'):>12,.0f}, "
+              f"{int(np.isnan(values[s]).sum())} months missing")
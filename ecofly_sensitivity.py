@@ -0,0 +1,123 @@
+from collections import namedtuple
+from dataclasses import replace
+from itertools import combinations
+
+import numpy as np
+
+from ecofly_assumptions import ASSUMPTION_FIELDS, DEFAULT_ASSUMPTIONS
+from ecofly_kpis import kpi_store
+from ecofly_perf import timed
+from ecofly_simulation import horizon, simulate_values
+
+# --------------------------
+# Sensitivity analysis
+# --------------------------
+# Every input is moved to a low and a high value around the current
+# assumptions, one at a time, and every pair of inputs over a small grid
+# of both ranges. All of these variants become one batch of assumption
+# arrays, so the whole analysis is a single simulate_values call that
+# covers every scenario, year and metric. Picking a scenario or year
+# afterwards only slices the result.
+#
+# name: (label, absolute or relative, step); the price steps are the
+# adjustments from the hybrid strategy (+€8 SH, +€15 LH, +€6 train).
+FACTORS = {
+    "sh_price": ("SH ticket price ±€8", "abs", 8.0),
+    "lh_price": ("LH ticket price ±€15", "abs", 15.0),
+    "train_price": ("Train ticket price ±€6", "abs", 6.0),
+    "saf_scale": ("SAF blend share ±20%", "rel", 0.2),
+    "pax_growth": ("PAX growth ±1 pt", "abs", 0.01),
+    "cargo_growth": ("Cargo growth ±1 pt", "abs", 0.01),
+    "cost_of_capital": ("Cost of capital ±1 pt", "abs", 0.01),
+    "inflation": ("Inflation ±0.5 pt", "abs", 0.005),
+    "fuel_price": ("Fuel price ±20%", "rel", 0.2),
+    "saf_price": ("SAF price ±25%", "rel", 0.25),
+}
+GRID_LEVELS = 5
+
+Sensitivity = namedtuple(
+    "Sensitivity", "factors labels levels scenarios years metrics base oat pairs grid"
+)
+
+
+def factor_levels(assumptions=DEFAULT_ASSUMPTIONS, factors=FACTORS, n=GRID_LEVELS):
+    """(factor, n) input values from low to high around the current assumptions."""
+    out = np.empty((len(factors), n))
+    for f, (name, (_, kind, step)) in enumerate(factors.items()):
+        centre = 1.0 if name == "saf_scale" else getattr(assumptions, name)
+        low, high = (centre - step, centre + step) if kind == "abs" else (centre * (1 - step), centre * (1 + step))
+        out[f] = np.linspace(low, high, n)
+    return out
+
+
+@timed("sensitivity")
+def sensitivity(assumptions=DEFAULT_ASSUMPTIONS, store=kpi_store, years=None, interpolation="linear",
+                factors=FACTORS, n=GRID_LEVELS, investments=None):
+    """One-at-a-time and pairwise sensitivity of every scenario, year and metric.
+
+    Shapes: base (S, Y, M); oat (F, 2, S, Y, M) for the low/high value of
+    each factor; grid (P, n, n, S, Y, M) over ``levels`` of each pair in
+    ``pairs`` (first factor along the first grid axis).
+    """
+    years = horizon(store) if years is None else np.asarray(years)
+    names = list(factors)
+    levels = factor_levels(assumptions, factors, n)
+    pairs = list(combinations(range(len(names)), 2))
+
+    # Batch rows: the current assumptions, then low/high per factor, then
+    # the n × n grid of each pair. Every row starts at the current values.
+    rows = 1 + 2 * len(names) + len(pairs) * n * n
+    centre = {f: getattr(assumptions, f) for f in ASSUMPTION_FIELDS}
+    centre["saf_scale"] = 1.0
+    inputs = {name: np.full(rows, float(value)) for name, value in centre.items()}
+    for f, name in enumerate(names):
+        inputs[name][1 + 2 * f:3 + 2 * f] = levels[f, [0, -1]]
+    first = 1 + 2 * len(names)
+    i_levels, j_levels = (a.ravel() for a in np.meshgrid(np.arange(n), np.arange(n), indexing="ij"))
+    for p, (i, j) in enumerate(pairs):
+        block = slice(first + p * n * n, first + (p + 1) * n * n)
+        inputs[names[i]][block] = levels[i, i_levels]
+        inputs[names[j]][block] = levels[j, j_levels]
+
+    saf_scale = inputs.pop("saf_scale")
+    batch = replace(assumptions, **inputs)
+    values = simulate_values(batch, store, years, interpolation=interpolation, saf_scale=saf_scale,
+                             investments=investments)
+    return Sensitivity(
+        names, [label for label, *_ in factors.values()], levels,
+        store.scenarios, [int(y) for y in years], store.metrics,
+        values[0], values[1:first].reshape(len(names), 2, *values.shape[1:]),
+        pairs, values[first:].reshape(len(pairs), n, n, *values.shape[1:]),
+    )
+
+
+def tornado(result, scenario, year, metric):
+    """(labels, low deltas, high deltas) against the base, largest swing first."""
+    s, y, m = result.scenarios.index(scenario), result.years.index(year), result.metrics.index(metric)
+    base = result.base[s, y, m]
+    low, high = result.oat[:, 0, s, y, m] - base, result.oat[:, 1, s, y, m] - base
+    order = np.argsort(-np.abs(high - low), kind="stable")
+    return [result.labels[f] for f in order], low[order], high[order]
+
+
+def pair_grid(result, first, second, scenario, year, metric):
+    """(first levels, second levels, n × n values) for two factors by name."""
+    i, j = result.factors.index(first), result.factors.index(second)
+    s, y, m = result.scenarios.index(scenario), result.years.index(year), result.metrics.index(metric)
+    p = result.pairs.index((min(i, j), max(i, j)))
+    grid = result.grid[p, :, :, s, y, m]
+    return (result.levels[i], result.levels[j], grid if i < j else grid.T)
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    result = sensitivity()
+    elapsed = time.perf_counter() - start
+    print(f"{1 + 2 * len(result.factors) + len(result.pairs) * GRID_LEVELS ** 2} variants in {elapsed * 1000:.0f} ms")
+    for metric in ("CO2", "Profit"):
+        labels, low, high = tornado(result, "Best Scenario – Hybrid", 2050, metric)
+        print(f"\nBest Scenario – Hybrid, 2050 {metric}")
+        for label, lo, hi in zip(labels, low, high):
+            print(f"  {label:<26} {lo:>+16,.0f} {hi:>+16,.0f}")
@@ -0,0 +1,230 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from functools import lru_cache
+
+import numpy as np
+
+from ecofly_assumptions import ASSUMPTION_FIELDS, DEFAULT_ASSUMPTIONS
+from ecofly_kpis import (
+    ANNUAL_YEARS, BASELINE, KpiStore, annual_grid, investment_plans, investments, kpi_store, technology_shares,
+)
+from ecofly_perf import timed
+
+# --------------------------
+# Scenario simulation engine
+# --------------------------
+# Every KPI is modelled as its calibrated reference path (the KPI tables,
+# interpolated per year) plus the effect of moving the key assumptions
+# away from their defaults. All drivers are ratios against the default
+# assumptions, so the defaults reproduce the tables exactly and any
+# what-if only adds a delta on top. Assumption fields may be scalars or
+# equally shaped arrays; arrays add leading batch dimensions to the result.
+HORIZON = np.asarray(ANNUAL_YEARS)
+BASE_YEAR = 2025
+GROWTH_END = 2041   # growth forecasts cover 2025–2041, volumes flat afterwards
+CARGO_SHARE = 0.1   # share of revenue and activity from cargo
+LOAN_TERM = 20      # years, straight-line repayment of investment loans
+FUEL_COST_SHARE = 0.3  # share of operating cost spent on fuel
+SAF_PREMIUM = 2.5      # SAF price as a multiple of fossil kerosene
+SAF_REDUCTION = 0.8    # life-cycle CO2 saving of SAF over fossil kerosene
+
+def horizon(store):
+    """Annual years to simulate: 2025–2050, widened to any years in the data."""
+    return np.arange(min(HORIZON[0], store.years[0]), max(HORIZON[-1], store.years[-1]) + 1)
+
+
+def technology_schedule(technology, scenarios, years):
+    """Adoption share of one technology per scenario/year (0 where unused)."""
+    out = np.zeros((len(scenarios), len(years)))
+    for s, scenario in enumerate(scenarios):
+        points = technology_shares.get(scenario, {}).get(technology)
+        if points:
+            out[s] = np.interp(years, list(points), list(points.values()))
+    return out
+
+
+def investment_schedule(scenario, amounts=None):
+    """Investment paid out (€) per year, {year: amount}, for one scenario.
+
+    ``amounts`` are the up-front figures in € million (KpiData.investments;
+    default the built-in `investments`). A scenario's phased plan applies
+    while its figure is the built-in one the plan was written for; otherwise
+    the figure is paid out in BASE_YEAR.
+    """
+    amounts = investments if amounts is None else amounts
+    plan = investment_plans.get(scenario)
+    if plan is None or amounts.get(scenario, investments.get(scenario)) != investments.get(scenario):
+        return {BASE_YEAR: amounts.get(scenario, 0) * 1e6}
+    return plan
+
+
+def outstanding_debt(scenarios, years, investments=None):
+    """Loan balance (€) per scenario/year for the investment schedules."""
+    out = np.zeros((len(scenarios), len(years)))
+    for s, scenario in enumerate(scenarios):
+        for year, amount in investment_schedule(scenario, investments).items():
+            age = years - year
+            out[s] += np.where(age >= 0, amount * np.clip(1 - age / LOAN_TERM, 0, 1), 0)
+    return out
+
+
+def simulate_values(assumptions=DEFAULT_ASSUMPTIONS, store=kpi_store, years=HORIZON, adoption=None,
+                    interpolation="linear", saf_scale=1.0, investments=None):
+    """KPI cube of shape (*batch, scenario, year, metric).
+
+    ``interpolation`` picks how the reference paths run between KPI table
+    years (see ecofly_kpis.annual_grid).
+
+    ``saf_scale`` multiplies every scenario's SAF blend (capped at 100%);
+    scalar or shaped like the batch dimensions.
+
+    ``adoption`` optionally scales how much of each scenario's difference
+    from the baseline is realised, broadcast against (*batch, scenario, year).
+
+    ``investments`` are the up-front figures (€ million) behind the loan
+    interest, see investment_schedule.
+    """
+    years = np.asarray(years)
+    a = {f: np.asarray(getattr(assumptions, f), dtype=float)[..., None, None] for f in ASSUMPTION_FIELDS}
+    a["saf_scale"] = np.asarray(saf_scale, dtype=float)[..., None, None]
+    d = {f: getattr(DEFAULT_ASSUMPTIONS, f) for f in ASSUMPTION_FIELDS}
+    ref = annual_grid(store, tuple(years.tolist()), interpolation).values
+    tau = technology_schedule("Train", store.scenarios, years)
+    saf = technology_schedule("SAF", store.scenarios, years)
+
+    growth_years = np.minimum(years, GROWTH_END) - BASE_YEAR
+    pax = ((1 + a["pax_growth"]) / (1 + d["pax_growth"])) ** growth_years
+    cargo = ((1 + a["cargo_growth"]) / (1 + d["cargo_growth"])) ** growth_years
+    prices = ((1 + a["inflation"]) / (1 + d["inflation"])) ** (years - BASE_YEAR)
+
+    def ticket_revenue(q):
+        return (1 - tau) * q["pax_sh"] * q["sh_price"] + q["pax_lh"] * q["lh_price"] + tau * q["pax_train"] * q["train_price"]
+
+    def travellers(q):
+        return (1 - tau) * q["pax_sh"] + q["pax_lh"] + tau * q["pax_train"]
+
+    def flyers(q):
+        return (1 - tau) * q["pax_sh"] + q["pax_lh"]
+
+    passengers = pax * travellers(a) / travellers(d)
+    revenue_factor = ((1 - CARGO_SHARE) * pax * ticket_revenue(a) / ticket_revenue(d) + CARGO_SHARE * cargo) * prices
+    volume_factor = (1 - CARGO_SHARE) * passengers + CARGO_SHARE * cargo
+    flight_factor = pax * flyers(a) / flyers(d)
+
+    m = store.metric_index
+    revenue, profit, cashflow = ref[..., m["Revenue"]], ref[..., m["Profit"]], ref[..., m["Cashflow"]]
+    d_revenue = revenue * (revenue_factor - 1)
+    saf_price = a["saf_price"] / d["saf_price"]
+    blend = np.minimum(saf * a["saf_scale"], 1)
+    # More or less SAF than the tables assume swaps fossil fuel for SAF at its premium.
+    fuel_factor = a["fuel_price"] / d["fuel_price"] * (
+        1 - saf + saf * saf_price + (blend - saf) * (SAF_PREMIUM * saf_price - 1)
+    )
+    operating_cost = revenue - profit
+    d_cost = operating_cost * (volume_factor * prices - 1) + operating_cost * FUEL_COST_SHARE * (fuel_factor - 1)
+    d_interest = (a["cost_of_capital"] - d["cost_of_capital"]) * outstanding_debt(store.scenarios, years, investments)
+    d_profit = d_revenue - d_cost - d_interest
+
+    batch = np.broadcast_shapes(*(v.shape[:-2] for v in a.values()))
+    out = np.broadcast_to(ref, batch + ref.shape).copy()
+    out[..., m["Revenue"]] = revenue + d_revenue
+    out[..., m["Profit"]] = profit + d_profit
+    out[..., m["Cashflow"]] = cashflow + d_profit
+    out[..., m["Waste"]] *= volume_factor
+    out[..., m["CO2"]] *= flight_factor * (1 - SAF_REDUCTION * blend) / (1 - SAF_REDUCTION * saf)
+    if adoption is not None and BASELINE in store.scenario_index:
+        base = out[..., [store.scenario_index[BASELINE]], :, :]
+        out = base + np.asarray(adoption)[..., None] * (out - base)
+        out[..., m["TRL"]] = ref[..., m["TRL"]]
+    return out
+
+
+@timed("simulate")
+def simulate(assumptions=DEFAULT_ASSUMPTIONS, store=kpi_store, years=None, interpolation="linear", investments=None):
+    """Annual KpiStore for one set of assumptions."""
+    years = horizon(store) if years is None else years
+    values = simulate_values(assumptions, store, years, interpolation=interpolation, investments=investments)
+    return KpiStore(store.scenarios, years, store.metrics, values)
+
+
+# --------------------------
+# Monte Carlo uncertainty
+# --------------------------
+# Sampled drivers: growth rates (normal, absolute spread), fuel and SAF
+# price indices (lognormal) and technology adoption. Adoption is certain at
+# TRL 9 and increasingly uncertain towards TRL 1, where on average only half
+# of a scenario's difference from the baseline materialises.
+MC_SPREAD = {"pax_growth": 0.01, "cargo_growth": 0.01, "fuel_price": 0.15, "saf_price": 0.25}
+MC_CHUNK = 5_000
+PERCENTILES = (5, 50, 95)
+
+
+def _mc_chunk(assumptions, store, years, interpolation, investments, scenario, metrics, n, seed):
+    rng = np.random.default_rng(seed)
+    draws = {}
+    for field, spread in MC_SPREAD.items():
+        centre = getattr(assumptions, field)
+        if field.endswith("_price"):
+            draws[field] = centre * rng.lognormal(-spread ** 2 / 2, spread, n)
+        else:
+            draws[field] = centre + rng.normal(0, spread, n)
+    sampled = replace(assumptions, **draws)
+
+    trl = annual_grid(store, tuple(years.tolist())).metric("TRL")
+    uncertainty = (9 - np.clip(trl, 1, 9)) / 8
+    adoption = 1 - uncertainty * rng.beta(2, 2, (n, len(store.scenarios), 1))
+
+    values = simulate_values(sampled, store, years, adoption=adoption, interpolation=interpolation,
+                             investments=investments)
+    return values[:, store.scenario_index[scenario]][..., [store.metric_index[m] for m in metrics]]
+
+
+@lru_cache(maxsize=1)
+def worker_pool():
+    # Shared by Monte Carlo, the optimizer, the flight model and the snapshot
+    # export. Threads, not processes: the dashboard and the KPI API are
+    # multithreaded, so a forked worker can inherit a lock another thread
+    # holds and hang, and spawned workers would import the Streamlit page
+    # script as their __main__. The chunks are large NumPy operations that
+    # release the GIL, and threads share their inputs instead of pickling.
+    return ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="ecofly-worker")
+
+
+@timed("monte_carlo")
+def monte_carlo(assumptions=DEFAULT_ASSUMPTIONS, scenario=BASELINE, metrics=("CO2", "Cashflow"),
+                n_samples=10_000, seed=0, store=kpi_store, years=None, interpolation="linear", parallel=None,
+                investments=None):
+    """P5/P50/P95 bands per metric, {metric: array of shape (3, year)}.
+
+    Samples are drawn in chunks of MC_CHUNK; with more than one chunk they
+    are spread over the worker pool unless ``parallel`` is False.
+    """
+    years = horizon(store) if years is None else np.asarray(years)
+    sizes = [MC_CHUNK] * (n_samples // MC_CHUNK) + ([n_samples % MC_CHUNK] if n_samples % MC_CHUNK else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(assumptions, store, years, interpolation, investments, scenario, tuple(metrics), n, sd)
+            for n, sd in zip(sizes, seeds)]
+    if parallel is None:
+        parallel = len(args) > 1
+    if parallel:
+        chunks = list(worker_pool().map(_mc_chunk, *zip(*args)))
+    else:
+        chunks = [_mc_chunk(*a) for a in args]
+    bands = np.percentile(np.concatenate(chunks), PERCENTILES, axis=0)
+    return {metric: bands[..., i] for i, metric in enumerate(metrics)}
+
+
+def calibration_error(store=kpi_store):
+    """Largest relative gap between the default simulation and the KPI tables."""
+    sim = simulate(DEFAULT_ASSUMPTIONS, store)
+    years = [y for y in store.years if y in sim.year_index]
+    table = store.take(years=years)
+    model = sim.take(years=years)
+    known = ~np.isnan(table)
+    scale = np.maximum(np.abs(table[known]), 1)
+    return float(np.max(np.abs(model[known] - table[known]) / scale))
+
+
+if __name__ == "__main__":
+    print(f"max calibration error: {calibration_error():.2e}")
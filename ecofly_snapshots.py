@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache, partial
+from pathlib import Path
+
+import numpy as np
+
+from ecofly_assets import STATIC_DIR
+from ecofly_kpis import BEST_SCENARIO
+
+# --------------------------
+# Static view snapshots
+# --------------------------
+# Every deterministic view (KPIs per scenario × year, the trend chart per
+# scenario, the comparison table per year) is rendered once to plain files
+# under static/snapshots/, which any static file server can host; the live
+# app also loads the trend figure JSON instead of building the chart. A view's
+# hash covers exactly the data it shows, so re-exporting only re-renders
+# views whose data changed, and the live app can tell whether a snapshot
+# matches what it would compute itself.
+SNAPSHOT_DIR = STATIC_DIR / "snapshots"
+SNAPSHOT_VERSION = "3"  # bump when a renderer's output changes
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def trend_kind(scenario):
+    return "hybrid_trend" if scenario == BEST_SCENARIO else "emissions_trend"
+
+
+def view_ids(store, investments):
+    """Every exportable view: kpis/<scenario>/<year>, <trend>/<scenario>, comparison/<year>."""
+    scenarios = [s for s in store.scenarios if s in investments or s == BEST_SCENARIO]
+    ids = [f"kpis/{slug(s)}/{y}" for s in scenarios for y in store.years]
+    ids += [f"{trend_kind(s)}/{slug(s)}" for s in scenarios]
+    ids += [f"comparison/{y}" for y in store.years]
+    return ids
+
+
+def _view_inputs(store, investments, raw_store, view):
+    """(kind, scenario, year, arrays and values the view is rendered from)."""
+    kind, *rest = view.split("/")
+    by_slug = {slug(s): s for s in store.scenarios}
+    if kind == "kpis":
+        scenario, year = by_slug[rest[0]], int(rest[1])
+        return kind, scenario, year, (store.scenarios, store.metrics, store.take([scenario], [year]))
+    if kind == "comparison":
+        year = int(rest[0])
+        scenarios = list(investments)
+        return kind, None, year, (scenarios, sorted(investments.items()), store.take(scenarios, [year]))
+    scenario = by_slug[rest[0]]
+    points = raw_store.known_years(scenario)
+    return kind, scenario, None, (store.years, points, store.take([scenario], None, ["CO2"]))
+
+
+def view_hash(store, investments, raw_store, view):
+    digest = hashlib.sha1(f"{SNAPSHOT_VERSION}|{view}".encode())
+    for part in _view_inputs(store, investments, raw_store, view)[3]:
+        digest.update(part.tobytes() if isinstance(part, np.ndarray) else repr(part).encode())
+    return digest.hexdigest()
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)  # the static server never sees half a file
+
+
+def render_view(store, investments, raw_store, view, out_dir=SNAPSHOT_DIR):
+    """Render one view; returns the written file names relative to out_dir."""
+    import plotly.io as pio
+
+    import ecofly_figures
+    from ecofly_format import format_number
+
+    kind, scenario, year, _ = _view_inputs(store, investments, raw_store, view)
+    files = []
+    if kind == "kpis":
+        values = dict(zip(store.metrics, store.get_kpi(scenario, year)))
+        payload = {
+            "scenario": scenario, "year": year,
+            "kpis": {m: None if v == "-" else v for m, v in values.items()},
+            "labels": {m: format_number(v) for m, v in values.items()},
+        }
+        files.append((f"{view}.json", json.dumps(payload, ensure_ascii=False, indent=1)))
+    elif kind == "comparison":
+        df = ecofly_figures.comparison_table(store, year, list(investments), investments)
+        files.append((f"{view}.json", df.to_json(orient="records", force_ascii=False, indent=1)))
+        files.append((f"{view}.csv", df.to_csv(index=False)))
+    else:
+        build = getattr(ecofly_figures, f"{kind}_figure")
+        fig = build(store, scenario, raw_store.known_years(scenario))
+        files.append((f"{view}.json", pio.to_json(fig)))
+        # plotly.js is written once per export next to the HTML files
+        files.append((f"{view}.html", pio.to_html(fig, include_plotlyjs="../plotly.min.js", full_html=True)))
+    for name, text in files:
+        _write(out_dir / name, text)
+    return [name for name, _ in files]
+
+
+# --------------------------
+# Export
+# --------------------------
+def export_snapshots(data=None, out_dir=SNAPSHOT_DIR, force=False):
+    """Render changed views with default assumptions; returns (rendered, unchanged) counts."""
+    import plotly.offline
+
+    from ecofly_datasource import default_source
+    from ecofly_simulation import simulate, worker_pool
+
+    data = data or default_source().current()
+    raw_store = data.store
+    store = simulate(store=raw_store, investments=data.investments)
+    old = read_manifest(out_dir / "manifest.json")
+    hashes = {view: view_hash(store, data.investments, raw_store, view) for view in view_ids(store, data.investments)}
+    entries = {}
+    todo = []
+    for view, digest in hashes.items():
+        entry = old.get(view)
+        if not force and entry and entry["hash"] == digest and all((out_dir / f).exists() for f in entry["files"]):
+            entries[view] = entry
+        else:
+            todo.append(view)
+
+    render = partial(render_view, store, data.investments, raw_store, out_dir=out_dir)
+    results = worker_pool().map(render, todo) if len(todo) > 1 else map(render, todo)
+    for view, files in zip(todo, results):
+        entries[view] = {"hash": hashes[view], "files": files}
+
+    plotly_js = out_dir / "plotly.min.js"
+    if todo or not plotly_js.exists():
+        _write(plotly_js, plotly.offline.get_plotlyjs())
+    _write(out_dir / "index.html", _index_html(store, data.investments))
+    _write(out_dir / "manifest.json", json.dumps(
+        {"version": SNAPSHOT_VERSION, "views": dict(sorted(entries.items()))}, ensure_ascii=False, indent=1
+    ))
+    return len(todo), len(hashes) - len(todo)
+
+
+def _index_html(store, investments):
+    rows = []
+    for view in view_ids(store, investments):
+        if view.startswith("kpis/"):
+            continue
+        suffix = "csv" if view.startswith("comparison/") else "html"
+        rows.append(f'<li><a href="{view}.{suffix}">{view}</a></li>')
+    return "<!doctype html><meta charset='utf-8'><title>EcoFly snapshots</title><ul>" + "".join(rows) + "</ul>"
+
+
+# --------------------------
+# Lookup from the live app
+# --------------------------
+def read_manifest(path=SNAPSHOT_DIR / "manifest.json"):
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _read_manifest(path, mtime)
+
+
+@lru_cache(maxsize=4)
+def _read_manifest(path, mtime):
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    return manifest["views"] if manifest.get("version") == SNAPSHOT_VERSION else {}
+
+
+def snapshot_file(store, investments, raw_store, view, suffix, out_dir=SNAPSHOT_DIR):
+    """Path of a snapshot file matching the current data, or None.
+
+    ``investments`` is only needed for comparison views.
+    """
+    entry = read_manifest(out_dir / "manifest.json").get(view)
+    name = f"{view}.{suffix}"
+    if not entry or name not in entry["files"] or entry["hash"] != view_hash(store, investments, raw_store, view):
+        return None
+    path = out_dir / name
+    return path if path.exists() else None
+
+
+def snapshot_figure(store, raw_store, scenario):
+    """The scenario's trend chart from its snapshot, or None when there is no current one."""
+    import plotly.io as pio
+
+    path = snapshot_file(store, None, raw_store, f"{trend_kind(scenario)}/{slug(scenario)}", "json")
+    return pio.read_json(path) if path else None
+
+
+def snapshot_url(path, out_dir=SNAPSHOT_DIR):
+    return f"app/static/{path.relative_to(out_dir.parent).as_posix()}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render static snapshots of every scenario/year view.")
+    parser.add_argument("--out", type=Path, default=SNAPSHOT_DIR)
+    parser.add_argument("--force", action="store_true", help="re-render every view")
+    args = parser.parse_args()
+    rendered, unchanged = export_snapshots(out_dir=args.out.resolve(), force=args.force)
+    print(f"{rendered} views rendered, {unchanged} unchanged, in {args.out}")